@@ -0,0 +1,106 @@
+"""
+Benchmark the agent loop offline: the agent runs with the local model backends
+against the stub converter of tests/stub_server.py, served from localhost, and the
+per-step latency, token counts and steps to completion are reported.
+
+Usage: python -m benchmarks.agent [--runs 5] [--command-cache]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+
+from tests.stub_server import start_stub_server
+from utils.config import config
+
+SCENARIOS = {
+    "upload": (
+        "Navigate to {base_url}/converter.html then upload the video {video_path} "
+        "then click the Convert button"
+    ),
+    "convert without file": (
+        "Navigate to {base_url}/converter.html then click the Convert button"
+    ),
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run_scenario(requirement: str, runs: int):
+    from e2e_test_agent.e2e_test_agent import E2eTestingAgent
+    from e2e_test_agent.recorder import is_successful_run
+
+    results = []
+    for _ in range(runs):
+        agent = E2eTestingAgent()
+        steps = await agent.ainvoke(requirement)
+        results.append(
+            {
+                "succeeded": is_successful_run(steps),
+                "actions": len(steps),
+                "graph_steps": len(agent.step_timings),
+                "step_seconds": [seconds for _, seconds in agent.step_timings],
+                "tokens": agent.budget.usage.total_tokens,
+            }
+        )
+    return results
+
+
+async def benchmark(runs: int):
+    from utils.browser_pool import browser_pool
+
+    server = start_stub_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    video_dir = tempfile.mkdtemp()
+    video_path = os.path.join(video_dir, "video.mp4")
+    with open(video_path, "wb") as file:
+        file.write(os.urandom(1024 * 1024))
+
+    print(
+        f"{'scenario':<22}{'passed':>8}{'actions':>9}{'steps':>7}"
+        f"{'step p50 (ms)':>15}{'step p95 (ms)':>15}{'run (s)':>9}{'tokens':>8}"
+    )
+    try:
+        for name, template in SCENARIOS.items():
+            requirement = template.format(base_url=base_url, video_path=video_path)
+            results = await run_scenario(requirement, runs)
+            step_seconds = [s for result in results for s in result["step_seconds"]]
+            print(
+                f"{name:<22}"
+                f"{sum(r['succeeded'] for r in results):>5}/{runs:<2}"
+                f"{statistics.median(r['actions'] for r in results):>9g}"
+                f"{statistics.median(r['graph_steps'] for r in results):>7g}"
+                f"{percentile(step_seconds, 0.5) * 1000:>15.1f}"
+                f"{percentile(step_seconds, 0.95) * 1000:>15.1f}"
+                f"{statistics.median(sum(r['step_seconds']) for r in results):>9.2f}"
+                f"{statistics.median(r['tokens'] for r in results):>8g}"
+            )
+    finally:
+        await browser_pool.close()
+        server.shutdown()
+        shutil.rmtree(video_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--command-cache",
+        action="store_true",
+        help="Keep the command cache on, so repeated runs measure cache hits.",
+    )
+    args = parser.parse_args()
+
+    config.model_backend = "local"
+    config.command_cache = args.command_cache
+    asyncio.run(benchmark(args.runs))
+
+
+if __name__ == "__main__":
+    main()
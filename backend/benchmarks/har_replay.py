@@ -0,0 +1,76 @@
+"""
+Check HAR recording and replay end to end: two tests are recorded against the stub
+converter of tests/stub_server.py, each into its own HAR, then both are replayed
+in one session with nothing listening at the converter URL, so every response has
+to come from the HAR of its test.
+
+Usage: python -m benchmarks.har_replay [--keep]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from utils.config import config
+
+TESTS = [
+    "tests/test_unsuccessful_youtube_upload.py",
+    "tests/test_unsuccessful_large_file_upload.py",
+]
+
+
+def run_tests(env: dict) -> bool:
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "--disable-warnings", *TESTS],
+        env={**os.environ, **env},
+    )
+    return result.returncode == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the recorded HARs afterwards."
+    )
+    args = parser.parse_args()
+
+    har_dir = tempfile.mkdtemp(prefix="har-replay-")
+    converter_url = f"http://127.0.0.1:{config.local_target_port}/"
+    try:
+        print("Recording against the stub converter.")
+        if not run_tests({"TARGET": "local", "HAR_MODE": "record", "HAR_DIR": har_dir}):
+            sys.exit("Recording failed")
+
+        recorded = sorted(os.listdir(har_dir))
+        print(f"Recorded: {', '.join(recorded)}")
+        missing = [
+            test
+            for test in TESTS
+            if not any(name.startswith(test.replace("/", "_")) for name in recorded)
+        ]
+        if missing:
+            sys.exit(f"No HAR recorded for {', '.join(missing)}")
+
+        # A live target is not served by the stub, so nothing answers at the URL.
+        print("Replaying without the stub converter.")
+        replay_env = {
+            "TARGET": "live",
+            "CONVERTER_URL": converter_url,
+            "HAR_MODE": "replay",
+            "HAR_DIR": har_dir,
+        }
+        if not run_tests(replay_env):
+            sys.exit("Replay failed")
+        print("Both tests replayed from their own HAR.")
+    finally:
+        if args.keep:
+            print(f"HARs kept in {har_dir}")
+        else:
+            shutil.rmtree(har_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
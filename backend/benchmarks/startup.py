@@ -0,0 +1,59 @@
+"""
+Measure the cold start of the backend: each import runs in a fresh interpreter,
+like a new container or a multiprocessing worker started with spawn.
+
+Usage: python -m benchmarks.startup [--runs 5]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+TARGETS = {
+    "main": "import main",
+    "tests": "import tests",
+    "agent": "import e2e_test_agent.e2e_test_agent",
+    "first dispatch": (
+        "from e2e_test_agent import action_dispatcher; "
+        "action_dispatcher.get_action('click_element')"
+    ),
+}
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+
+def measure(statement: str, runs: int):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(statement=statement)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'target':<16}{'median (s)':>12}{'min (s)':>12}{'max (s)':>12}")
+    for name, statement in TARGETS.items():
+        timings = measure(statement, args.runs)
+        print(
+            f"{name:<16}{statistics.median(timings):>12.3f}"
+            f"{min(timings):>12.3f}{max(timings):>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
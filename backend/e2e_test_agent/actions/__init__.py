@@ -1,10 +1,13 @@
 from abc import ABC, abstractmethod
-import importlib
+import ast
+from collections.abc import Mapping
+import importlib.util
+import json
 import logging
 import pathlib
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
 
-from e2e_test_agent.states import AgentState
+from e2e_test_agent.states import ActionStep, AgentState
 
 
 class BaseAction(ABC):
@@ -35,10 +38,149 @@ class BaseAction(ABC):
         """
         pass
 
+    def record(self, state: AgentState, error: Optional[str] = None) -> ActionStep:
+        """
+        Record the executed action with its data, so a successful run can be
+        replayed without the agent.
+
+        :param state: The agent state the action was executed with.
+        :param error: The error message if the action failed.
+        """
+        data = state["data"]
+        if hasattr(data, "dict"):
+            data = data.dict(exclude_none=True)
+        return ActionStep(action=self.action_type, data=dict(data), error=error)
+
+
+class ActionSpec(NamedTuple):
+    """Where an action is defined, as recorded in the action manifest."""
+
+    path: str
+    class_name: str
+    doc: Optional[str]
+
+
+def _import_file(path: pathlib.Path):
+    spec = importlib.util.spec_from_file_location(path.stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class ClassInfo(NamedTuple):
+    """A class defined in an action file, as recorded in the action manifest."""
+
+    name: str
+    bases: List[str]
+    action_type: Optional[str]
+    doc: Optional[str]
+
+
+def _scan_action_file(path: pathlib.Path) -> List[ClassInfo]:
+    """
+    Find the classes defined in a file by parsing it, without importing it, with
+    their base names and their action type when it is a plain string literal.
+    """
+    classes = []
+    tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        action_type = None
+        for statement in node.body:
+            if (
+                isinstance(statement, ast.Assign)
+                and any(
+                    getattr(t, "id", None) == "action_type" for t in statement.targets
+                )
+                and isinstance(statement.value, ast.Constant)
+            ):
+                action_type = statement.value.value
+        classes.append(
+            ClassInfo(
+                node.name,
+                [
+                    getattr(base, "id", getattr(base, "attr", None))
+                    for base in node.bases
+                ],
+                action_type,
+                ast.get_docstring(node, clean=False),
+            )
+        )
+    return classes
+
+
+def _resolve_actions(
+    classes: Dict[str, Tuple[str, ClassInfo]]
+) -> Dict[str, ActionSpec]:
+    """
+    Find the actions among the classes of the action files, following their bases
+    through the classes of the package. Only a class with a base defined outside
+    the package, or whose action type is not a literal, is imported to check it.
+    """
+
+    def is_action(name: str, seen: frozenset) -> Optional[bool]:
+        # True or False when known from the manifest, None when it takes an import.
+        if name == "BaseAction":
+            return True
+        if name not in classes or name in seen:
+            return None
+        results = [is_action(base, seen | {name}) for base in classes[name][1].bases]
+        if True in results:
+            return True
+        return None if None in results else False
+
+    def literal_action_type(name: str, seen: frozenset) -> Optional[str]:
+        if name not in classes or name in seen:
+            return None
+        info = classes[name][1]
+        if info.action_type is not None:
+            return info.action_type
+        for base in info.bases:
+            action_type = literal_action_type(base, seen | {name})
+            if action_type is not None:
+                return action_type
+        return None
+
+    specs = {}
+    for name, (path, info) in classes.items():
+        found = is_action(name, frozenset())
+        if found is False:
+            continue
+        action_type = literal_action_type(name, frozenset()) if found else None
+        if action_type is None:
+            action_class = getattr(_import_file(pathlib.Path(path)), name)
+            if not issubclass(action_class, BaseAction):
+                continue
+            action_type = action_class.action_type
+            if not isinstance(action_type, str):
+                # An abstract intermediate base class.
+                continue
+        specs[action_type] = ActionSpec(path, name, info.doc)
+    return specs
+
+
+class LazyActions(Mapping):
+    """Mapping of action type to action instance, importing each action on first use."""
+
+    def __init__(self, dispatcher: "ActionDispatcher"):
+        self.dispatcher = dispatcher
+
+    def __getitem__(self, action_type: str) -> BaseAction:
+        return self.dispatcher.get_action(action_type)
+
+    def __iter__(self):
+        return iter(self.dispatcher.action_types())
+
+    def __len__(self):
+        return len(self.dispatcher.action_types())
+
 
 class ActionDispatcher:
     def __init__(self):
-        self.actions: Dict[str, BaseAction] = {}
+        self.manifest: Dict[str, ActionSpec] = {}
+        self.instances: Dict[str, BaseAction] = {}
+        self.actions = LazyActions(self)
 
     def register_action(self, action_type: str, action: BaseAction):
         """
@@ -47,38 +189,96 @@ class ActionDispatcher:
         :param action_type: The type of action.
         :param action: The action instance.
         """
-        self.actions[action_type] = action
+        self.instances[action_type] = action
+
+    def action_types(self) -> List[str]:
+        return list(dict.fromkeys([*self.manifest, *self.instances]))
+
+    def get_action(self, action_type: str) -> BaseAction:
+        """
+        Return the action for the type, importing and instantiating it on first use.
+
+        :param action_type: The type of action.
+        """
+        if action_type not in self.instances:
+            spec = self.manifest[action_type]
+            module = _import_file(pathlib.Path(spec.path))
+            self.register_action(action_type, getattr(module, spec.class_name)())
+            logging.info(f"Loaded action for type: {action_type}")
+        return self.instances[action_type]
+
+    def describe(self, action_type: str) -> Optional[str]:
+        """Return the docstring of the action without importing it."""
+        if action_type in self.manifest:
+            return self.manifest[action_type].doc
+        return self.instances[action_type].__doc__
+
+    def node(self, action_type: str):
+        """Return a graph node which dispatches the agent state to the action."""
+
+        async def run(state: AgentState) -> Optional[Dict[str, Any]]:
+            return await self.get_action(action_type).run(state)
+
+        run.__name__ = action_type
+        return run
 
     def load_actions(
         self, directory: Union[str, pathlib.Path] = pathlib.Path(__file__).parent
     ):
-        for path in pathlib.Path(directory).rglob("*.py"):
-            spec = importlib.util.spec_from_file_location(path.stem, path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-
-            for name in dir(module):
-                obj = getattr(module, name)
-                if (
-                    isinstance(obj, type)
-                    and issubclass(obj, BaseAction)
-                    and obj != BaseAction
-                ):
-                    self.register_action(obj.action_type, obj())
+        """
+        Discover the actions in the directory through a manifest, which is cached in
+        the __pycache__ folder of the directory and rebuilt for the files which
+        changed since it was written. Actions are only imported on first dispatch.
+        """
+        directory = pathlib.Path(directory)
+        manifest_path = directory / "__pycache__" / "action_manifest.json"
+        try:
+            cached = json.loads(manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cached = {}
+
+        files = {}
+        classes = {}
+        for path in sorted(directory.rglob("*.py")):
+            if path.name == "__init__.py" or "__pycache__" in path.parts:
+                continue
+            stat = path.stat()
+            signature = [stat.st_mtime_ns, stat.st_size]
+            entry = cached.get(str(path))
+            if (
+                entry is None
+                or entry["signature"] != signature
+                or "classes" not in entry
+            ):
+                entry = {
+                    "signature": signature,
+                    "classes": [list(info) for info in _scan_action_file(path)],
+                }
+            files[str(path)] = entry
+            for info in entry["classes"]:
+                classes.setdefault(info[0], (str(path), ClassInfo(*info)))
+        self.manifest.update(_resolve_actions(classes))
+
+        if files != cached:
+            try:
+                manifest_path.parent.mkdir(exist_ok=True)
+                manifest_path.write_text(json.dumps(files), encoding="utf-8")
+            except OSError as e:
+                logging.warning(f"Failed to write action manifest: {e}")
 
     @classmethod
     def get_dispatcher_with_loaded_actions(cls, directory: str = None):
         """
-        Create a ActionDispatcher instance and automatically load actions from the specified directory.
-        If no directory is provided, it defaults to the directory of this file. Additionally, logs which actions were loaded.
+        Create a ActionDispatcher instance and automatically discover actions from the specified directory.
+        If no directory is provided, it defaults to the directory of this file. Additionally, logs which actions were discovered.
 
         :param directory: The directory from which to load actions. Defaults to the directory of this file.
-        :return: An instance of ActionDispatcher with actions loaded.
+        :return: An instance of ActionDispatcher with actions discovered.
         """
         if directory is None:
             directory = pathlib.Path(__file__).parent
         dispatcher = cls()
         dispatcher.load_actions(directory)
-        for action_type in dispatcher.actions.keys():
-            logging.info(f"Loaded action for type: {action_type}")
+        for action_type in dispatcher.manifest.keys():
+            logging.info(f"Discovered action for type: {action_type}")
         return dispatcher
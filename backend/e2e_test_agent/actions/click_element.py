@@ -23,9 +23,12 @@ class ClickElement(BaseAction):
         try:
             await page.click(selector)
             ai_message = AIMessage(content=f"Clicked {selector} element successfully")
-            return {"messages": [ai_message]}
+            return {"messages": [ai_message], "steps": [self.record(state)]}
         except Exception as e:
             error_message = AIMessage(
                 content=f"Failed to click {selector} element: {str(e)}"
             )
-            return {"messages": [error_message]}
+            return {
+                "messages": [error_message],
+                "steps": [self.record(state, str(e))],
+            }
@@ -4,11 +4,12 @@ from langchain_core.messages import AIMessage
 
 from e2e_test_agent.actions import BaseAction
 from e2e_test_agent.states import AgentState
+from utils.video_fixtures import resolve_file_path
 
 
 class InputFile(BaseAction):
     """
-    Input file action is used to select file for input[type=file] element of the page. You must provide CSS 'selector' of element which to be clicked and 'file_path' to be selected.
+    Input file action is used to select file for input[type=file] element of the page. You must provide CSS 'selector' of element which to be clicked and 'file_path' to be selected. To select a generated video of a given size instead of an existing file, use 'synthetic:<size>.mp4' as 'file_path', e.g. 'synthetic:4GB+1MB.mp4'.
     """
 
     action_type = "input_file"
@@ -22,13 +23,16 @@ class InputFile(BaseAction):
             raise Exception("Can't find selector and file_path")
 
         try:
-            await page.set_input_files(selector, file_path)
+            await page.set_input_files(selector, resolve_file_path(file_path))
             ai_message = AIMessage(
                 content=f"Selected {file_path} successfully to {selector} element"
             )
-            return {"messages": [ai_message]}
+            return {"messages": [ai_message], "steps": [self.record(state)]}
         except Exception as e:
             error_message = AIMessage(
                 content=f"Failed to select {file_path} to {selector} element: {str(e)}"
             )
-            return {"messages": [error_message]}
+            return {
+                "messages": [error_message],
+                "steps": [self.record(state, str(e))],
+            }
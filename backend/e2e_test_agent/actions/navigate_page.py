@@ -24,7 +24,10 @@ class NavigatePage(BaseAction):
             await page.goto(url)
         except Exception as e:
             error_message = AIMessage(content=f"Failed to navigate to {url}: {str(e)}")
-            return {"messages": [error_message]}
+            return {
+                "messages": [error_message],
+                "steps": [self.record(state, str(e))],
+            }
 
         ai_message = AIMessage(content=f"Navigated to {url} successfully.")
-        return {"messages": [ai_message]}
+        return {"messages": [ai_message], "steps": [self.record(state)]}
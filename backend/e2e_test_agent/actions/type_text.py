@@ -24,9 +24,12 @@ class TypeText(BaseAction):
         try:
             await page.fill(selector, text)
             ai_message = AIMessage(content=f"Typed {text} to {selector} element")
-            return {"messages": [ai_message]}
+            return {"messages": [ai_message], "steps": [self.record(state)]}
         except Exception as e:
             error_message = AIMessage(
                 content=f"Failed to type {text} to {selector} element: {str(e)}"
             )
-            return {"messages": [error_message]}
+            return {
+                "messages": [error_message],
+                "steps": [self.record(state, str(e))],
+            }
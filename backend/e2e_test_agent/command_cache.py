@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+import json
+from typing import List, Optional
+
+from e2e_test_agent.states import ActionStep, AgentState
+from utils.config import config
+from utils.db import DB_NAME
+from utils.sqlite_cache import SQLiteCache
+
+command_cache = SQLiteCache(
+    DB_NAME,
+    "commands",
+    max_bytes=config.command_cache_max_mb * 1024 * 1024,
+    max_age=config.command_cache_max_age_days * 24 * 60 * 60,
+)
+
+
+def _step_signature(step: ActionStep) -> List:
+    return [step.action, step.data, step.error]
+
+
+def command_cache_key(state: AgentState, page_content: str, kind: str) -> str:
+    """
+    Key of the decision for the requirement on the page, given the last
+    COMMAND_CACHE_HISTORY steps. Descriptions written by the model are left out,
+    as they differ from run to run for the same decision.
+
+    :param state: The agent state the decision is made for.
+    :param page_content: The distilled content of the page.
+    :param kind: What is cached, e.g. "plan" or "command".
+    """
+    steps = state.get("steps") or []
+    history = steps[-config.command_cache_history :] if steps else []
+    payload = json.dumps(
+        [
+            kind,
+            state["requirement"],
+            hashlib.sha256(page_content.encode("utf-8")).hexdigest(),
+            [_step_signature(step) for step in history],
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def get_cached_command(key: str) -> Optional[str]:
+    value = await asyncio.to_thread(command_cache.get, key)
+    return value.decode("utf-8") if value is not None else None
+
+
+async def set_cached_command(key: str, value: str):
+    await asyncio.to_thread(command_cache.set, key, value.encode("utf-8"))
+
+
+async def invalidate_cached_command(state: AgentState):
+    """Drop the cached decision the current action came from, as it failed."""
+    key = state.get("command_cache_key")
+    if key:
+        await asyncio.to_thread(command_cache.delete, key)
@@ -1,24 +1,56 @@
 import asyncio
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from playwright.async_api import Page
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import SKLearnVectorStore
-from langchain_core.messages import AIMessage
+from langchain_core.messages import AIMessage, BaseMessage
 
-from e2e_test_agent.states import AgentState
-from e2e_test_agent import all_actions
+from e2e_test_agent.command_cache import (
+    command_cache_key,
+    get_cached_command,
+    invalidate_cached_command,
+    set_cached_command,
+)
+from e2e_test_agent.embedding_cache import CachedEmbeddings
+from e2e_test_agent.fast_path import fast_path
+from e2e_test_agent.page_index import PageIndex
+from e2e_test_agent.states import ActionStep, AgentState
+from e2e_test_agent import action_dispatcher, all_actions
 from utils.config import config
+from utils.sqlite_cache import embedding_cache
 
-rules = [f"{key}: {all_actions[key].__doc__}" for key in all_actions.keys()]
+rules = [f"{key}: {action_dispatcher.describe(key)}" for key in all_actions.keys()]
 
-splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=20)
-embeddings = OpenAIEmbeddings(
-    api_key=config.openai_api_key, model="text-embedding-3-small"
-)
+embedding_model = "text-embedding-3-small"
+
+
+# Models and the splitter are created on first use, so that importing the agent
+# (e.g. in the server or a test worker process) does not pay for them.
+@lru_cache(maxsize=None)
+def get_splitter():
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=20)
+
+
+@lru_cache(maxsize=None)
+def get_embeddings() -> CachedEmbeddings:
+    if config.model_backend == "local":
+        from e2e_test_agent.local_models import HashingEmbeddings
+
+        return CachedEmbeddings(
+            HashingEmbeddings(), "local-hashing-256", embedding_cache
+        )
+
+    from langchain_openai import OpenAIEmbeddings
+
+    return CachedEmbeddings(
+        OpenAIEmbeddings(api_key=config.openai_api_key, model=embedding_model),
+        embedding_model,
+        embedding_cache,
+    )
 
 
 class ActionData(BaseModel):
@@ -52,8 +84,60 @@ class Command(BaseModel):
     )
 
 
-fast_llm = ChatOpenAI(api_key=config.openai_api_key, model="gpt-3.5-turbo")
-long_context_llm = ChatOpenAI(api_key=config.openai_api_key, model="gpt-4o")
+class Postcondition(BaseModel):
+    kind: str = Field(
+        ...,
+        title="Postcondition kind",
+        description="Valid options are: selector_visible, url_contains, text_visible",
+    )
+    value: str = Field(
+        ...,
+        title="Postcondition value",
+        description="The CSS selector, the part of the URL or the text to be checked.",
+    )
+
+
+class PlannedAction(Command):
+    postcondition: Optional[Postcondition] = Field(
+        None,
+        title="Postcondition",
+        description="What must hold on the page once the action was performed.",
+    )
+
+
+class Plan(BaseModel):
+    actions: List[PlannedAction] = Field(
+        ...,
+        title="Actions to be performed in order",
+        description=(
+            "The actions which can be performed one after another without looking at "
+            "the page again. End the list with END when the requirement is met."
+        ),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_fast_llm():
+    if config.model_backend == "local":
+        from e2e_test_agent.local_models import LocalChatModel
+
+        return LocalChatModel()
+
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(api_key=config.openai_api_key, model="gpt-3.5-turbo")
+
+
+@lru_cache(maxsize=None)
+def get_long_context_llm():
+    if config.model_backend == "local":
+        from e2e_test_agent.local_models import LocalChatModel
+
+        return LocalChatModel()
+
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(api_key=config.openai_api_key, model="gpt-4o")
 
 
 find_possible_dom_details_prompt = ChatPromptTemplate.from_messages(
@@ -66,29 +150,129 @@ find_possible_dom_details_prompt = ChatPromptTemplate.from_messages(
         MessagesPlaceholder(variable_name="messages", optional=True),
     ]
 )
-find_possible_dom_details = find_possible_dom_details_prompt | fast_llm
 
 
-async def index_page(page: Page):
-    page_content = await page.content()
-    split_docs = splitter.create_documents([page_content])
+@lru_cache(maxsize=None)
+def get_find_possible_dom_details():
+    return find_possible_dom_details_prompt | get_fast_llm()
+
+
+def create_page_index() -> PageIndex:
+    return PageIndex(get_embeddings(), get_splitter())
+
+
+async def index_page(
+    page: Page, page_index: PageIndex, page_content: Optional[str] = None
+):
     try:
-        vectorstore = await SKLearnVectorStore.afrom_documents(
-            split_docs,
-            embedding=embeddings,
-        )
-        retriever = vectorstore.as_retriever()
-        return retriever
+        return await page_index.aretriever(page, page_content)
     except Exception as e:
         print(e)
         return None
 
 
+class Speculation:
+    """
+    Work for the next decision which is started as soon as an action is done: the DOM
+    hint, computed from the history including the action's messages, and the index
+    of the page once it settled. The hint is only reused when the last message of
+    the history is still the last one the action added.
+    """
+
+    def __init__(
+        self,
+        hint: asyncio.Task,
+        index: asyncio.Task,
+        last_message: Optional[BaseMessage],
+    ):
+        self.hint = hint
+        self.index = index
+        self.last_message = last_message
+
+    def is_valid(self, state: AgentState) -> bool:
+        messages = state.get("messages") or []
+        return (messages[-1] if messages else None) is self.last_message
+
+    def cancel(self):
+        self.hint.cancel()
+        self.index.cancel()
+
+
+async def settle_and_index(page: Page, page_index: PageIndex):
+    try:
+        await page.wait_for_load_state(
+            "networkidle", timeout=config.settle_timeout * 1000
+        )
+    except Exception:
+        pass
+    return await index_page(page, page_index)
+
+
+def speculative(run):
+    """
+    Wrap an action node so that, once the action is done, the DOM hint for the next
+    decision is requested while the page settles and is indexed. Nothing is started
+    when more planned actions follow, or when the action failed.
+    """
+
+    async def speculative_run(state: AgentState) -> Optional[Dict[str, Any]]:
+        if state.get("plan"):
+            return await run(state)
+
+        result = await run(state) or {}
+        steps = result.get("steps") or []
+        if not steps or not all(step.succeeded for step in steps):
+            return {**result, "speculation": None}
+
+        page_index = state.get("page_index") or create_page_index()
+        messages = [*(state.get("messages") or []), *(result.get("messages") or [])]
+        hint = asyncio.create_task(
+            get_find_possible_dom_details().ainvoke({**state, "messages": messages})
+        )
+        index = asyncio.create_task(settle_and_index(state["page"], page_index))
+        return {
+            **result,
+            "page_index": page_index,
+            "speculation": Speculation(hint, index, messages[-1] if messages else None),
+        }
+
+    speculative_run.__name__ = run.__name__
+    return speculative_run
+
+
+async def settled_page_content(state: AgentState) -> Optional[str]:
+    """
+    Wait for the speculative indexing of the page and return the content it
+    distilled once the page settled, or None when there is none.
+    """
+    speculation: Optional[Speculation] = state.get("speculation")
+    page_index: Optional[PageIndex] = state.get("page_index")
+    if speculation is None or page_index is None:
+        return None
+    await asyncio.gather(speculation.index, return_exceptions=True)
+    if speculation.index.cancelled():
+        return None
+    return page_index.content
+
+
 async def retrieve(state: AgentState):
     page = state["page"]
-    retriever = await index_page(page)
-    coros = (index_page(page), find_possible_dom_details.ainvoke(state))
-    results = await asyncio.gather(*coros)
+    page_index = state.get("page_index") or create_page_index()
+    # The page is only distilled here when it was not for this decision already.
+    page_content = state.get("page_content")
+    if page_content is None:
+        page_content = await settled_page_content(state)
+    speculation: Optional[Speculation] = state.get("speculation")
+    hint = None
+    if speculation is not None:
+        if speculation.is_valid(state):
+            hint = speculation.hint
+        else:
+            speculation.hint.cancel()
+    if hint is None:
+        hint = get_find_possible_dom_details().ainvoke(state)
+
+    results = await asyncio.gather(index_page(page, page_index, page_content), hint)
     retriever = results[0]
     possible_dom_details: str = results[1].content
     try:
@@ -105,28 +289,160 @@ command_gen_prompt = ChatPromptTemplate.from_messages(
     [
         (
             "system",
-            """Analyze the provided page parts and determine the appropriate action to meet the user's requirement and based on what we have done so far. Populate the 'data' field with the necessary information as a dictionary. If all actions are completed or a step fails, respond with 'END' for the action. Ensure the 'data' field contains any additional information needed to perform the action.
+            """Analyze the provided page parts and determine the appropriate action to meet the user's requirement and based on what we have done so far. Page parts list the visible interactive elements of the page, one per line, each with its role, label, text and a CSS selector which matches exactly that element; use these selectors as they are. Populate the 'data' field with the necessary information as a dictionary. If all actions are completed or a step fails, respond with 'END' for the action. Ensure the 'data' field contains any additional information needed to perform the action.
             """,
         ),
         ("user", "Requirement: {requirement}\nPage Parts: {docs}"),
         MessagesPlaceholder(variable_name="messages", optional=True),
     ]
 )
-command_generator = (
-    retrieve | command_gen_prompt | long_context_llm.with_structured_output(Command)
+
+
+plan_gen_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """Analyze the provided page parts and plan the ordered actions to meet the user's requirement based on what we have done so far. Page parts list the visible interactive elements of the page, one per line, each with its role, label, text and a CSS selector which matches exactly that element; use these selectors as they are. Plan as many actions as you can predict without seeing the page again, and give each action a postcondition which tells whether it worked: a selector which becomes visible, a part of the URL or a text which becomes visible. Stop the plan before any action whose selector you can only guess. Populate the 'data' field of every action with the necessary information as a dictionary. If all actions are completed or a step fails, respond with a single 'END' action.
+            """,
+        ),
+        ("user", "Requirement: {requirement}\nPage Parts: {docs}"),
+        MessagesPlaceholder(variable_name="messages", optional=True),
+    ]
 )
 
 
+@lru_cache(maxsize=None)
+def get_command_generator():
+    return (
+        retrieve
+        | command_gen_prompt
+        | get_long_context_llm().with_structured_output(Command)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_plan_generator():
+    return (
+        retrieve | plan_gen_prompt | get_long_context_llm().with_structured_output(Plan)
+    )
+
+
+def cancel_speculation(state: AgentState):
+    speculation: Optional[Speculation] = state.get("speculation")
+    if speculation is not None:
+        speculation.cancel()
+
+
+def ends_run(decision) -> bool:
+    """Whether a command or plan ends the run."""
+    actions = getattr(decision, "actions", None)
+    if actions is not None:
+        return not actions or actions[0].action == "END"
+    return decision.action == "END"
+
+
+async def cached_decision(state: AgentState, kind: str, generator, schema):
+    """
+    Return the decision cached for the requirement, the page once it settled and
+    the recent steps, or generate and cache it, together with its cache key.
+    Decisions which end the run are not cached, as no failed step would ever
+    invalidate a wrong one.
+    """
+    if not config.command_cache:
+        return await generator.ainvoke(state), None
+
+    page_content = await settled_page_content(state)
+    if page_content is None:
+        page_index = state.get("page_index") or create_page_index()
+        page_content = await page_index.page_content(state["page"])
+    key = command_cache_key(state, page_content, kind)
+    cached = await get_cached_command(key)
+    if cached is not None:
+        try:
+            decision = schema.parse_raw(cached)
+            cancel_speculation(state)
+            return decision, key
+        except Exception as e:
+            print(f"Ignoring unreadable cached {kind}: {e}")
+
+    decision = await generator.ainvoke({**state, "page_content": page_content})
+    if ends_run(decision):
+        return decision, None
+    await set_cached_command(key, decision.json())
+    return decision, key
+
+
+async def generate_plan(state: AgentState):
+    plan, key = await cached_decision(state, "plan", get_plan_generator(), Plan)
+    if not plan.actions:
+        return {"action": "END", "plan": [], "speculation": None}
+    first, *rest = plan.actions
+    ai_message = AIMessage(
+        content=" ".join(action.description for action in plan.actions)
+    )
+    return {
+        "action": first.action,
+        "data": first.data,
+        "postcondition": first.postcondition,
+        "plan": rest,
+        "speculation": None,
+        "command_cache_key": key,
+        "messages": [ai_message],
+    }
+
+
+async def decide(state: AgentState):
+    steps = state.get("steps") or []
+    if steps and not steps[-1].succeeded:
+        await invalidate_cached_command(state)
+
+    if config.fast_path:
+        command = await fast_path(state)
+        if command is not None:
+            cancel_speculation(state)
+            return {
+                "action": command.action,
+                "data": ActionData(**command.data),
+                "plan": [],
+                "postcondition": None,
+                "speculation": None,
+                "command_cache_key": None,
+                "fast_path_steps": (state.get("fast_path_steps") or 0) + 1,
+                "messages": [AIMessage(content=command.description)],
+            }
+
+    if config.agent_plan_mode:
+        return await generate_plan(state)
+
+    command, key = await cached_decision(
+        state, "command", get_command_generator(), Command
+    )
+    ai_message = AIMessage(content=command.description)
+    return {
+        "action": command.action,
+        "data": command.data,
+        "speculation": None,
+        "command_cache_key": key,
+        "messages": [ai_message],
+    }
+
+
 async def decision_generator(state: AgentState):
+    """
+    Decide the next action. The end of the run is added to the steps, with an error
+    when it ends because no decision could be made.
+    """
     try:
-        command: Command = await command_generator.ainvoke(state)
-        ai_message = AIMessage(content=command.description)
-        return {
-            **state,
-            "action": command.action,
-            "data": command.data,
-            "messages": [ai_message],
-        }
+        decision = await decide(state)
     except Exception as e:
         print(e)
-        return {**state, "action": "END"}
+        cancel_speculation(state)
+        error = f"Failed to decide the next action: {e}"
+        return {
+            "action": "END",
+            "speculation": None,
+            "steps": [ActionStep(action="END", data={}, error=error)],
+        }
+    if decision["action"] == "END":
+        decision["steps"] = [ActionStep(action="END", data={})]
+    return decision
@@ -0,0 +1,147 @@
+from typing import Any, Dict, List
+
+from playwright.async_api import Page
+
+# Runs inside the page and returns the interactive and visible elements together with
+# a CSS selector which matches exactly that element in the current document.
+DISTILL_SCRIPT = """
+() => {
+  const INTERACTIVE = [
+    "a[href]", "button", "input", "select", "textarea", "summary", "[role]",
+    "[onclick]", "[contenteditable='true']", "[tabindex]:not([tabindex='-1'])",
+    "[aria-live]", "h1", "h2", "h3",
+  ].join(", ");
+  const SELECTOR_ATTRIBUTES = [
+    "data-testid", "data-test", "data-qa", "name", "aria-label", "placeholder", "title",
+  ];
+
+  const clip = (value, length) => (value || "").replace(/\\s+/g, " ").trim().slice(0, length);
+  const quote = (value) => value.replace(/\\\\/g, "\\\\\\\\").replace(/"/g, '\\\\"');
+  const isUnique = (selector) => {
+    try {
+      return document.querySelectorAll(selector).length === 1;
+    } catch (e) {
+      return false;
+    }
+  };
+
+  const isVisible = (el) => {
+    // File inputs are usually hidden behind a styled button but can still be set.
+    if (el.tagName === "INPUT" && el.type === "file") return true;
+    const style = getComputedStyle(el);
+    if (style.display === "none" || style.visibility === "hidden") return false;
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0;
+  };
+
+  const selectorFor = (el) => {
+    const tag = el.tagName.toLowerCase();
+    if (el.id && isUnique("#" + CSS.escape(el.id))) return "#" + CSS.escape(el.id);
+    for (const attribute of SELECTOR_ATTRIBUTES) {
+      const value = el.getAttribute(attribute);
+      if (!value) continue;
+      const selector = `${tag}[${attribute}="${quote(value)}"]`;
+      if (isUnique(selector)) return selector;
+    }
+    if (tag === "input" && el.type) {
+      const selector = `input[type="${el.type}"]`;
+      if (isUnique(selector)) return selector;
+    }
+
+    const parts = [];
+    let node = el;
+    while (node && node.nodeType === 1 && node !== document.documentElement) {
+      if (node.id && isUnique("#" + CSS.escape(node.id))) {
+        parts.unshift("#" + CSS.escape(node.id));
+        break;
+      }
+      let part = node.tagName.toLowerCase();
+      const parent = node.parentElement;
+      if (parent) {
+        const siblings = Array.from(parent.children).filter((c) => c.tagName === node.tagName);
+        if (siblings.length > 1) part += `:nth-of-type(${siblings.indexOf(node) + 1})`;
+      }
+      parts.unshift(part);
+      node = parent;
+    }
+    return parts.join(" > ");
+  };
+
+  const roleFor = (el) => {
+    const role = el.getAttribute("role");
+    if (role) return role;
+    const tag = el.tagName.toLowerCase();
+    if (tag === "a") return "link";
+    if (tag === "button" || tag === "summary") return "button";
+    if (tag === "select") return "combobox";
+    if (tag === "textarea") return "textbox";
+    if (/^h[1-6]$/.test(tag)) return "heading";
+    if (tag === "input") {
+      const type = (el.type || "text").toLowerCase();
+      if (["button", "submit", "reset", "image"].includes(type)) return "button";
+      if (["checkbox", "radio", "file", "range"].includes(type)) return type;
+      return "textbox";
+    }
+    return el.hasAttribute("aria-live") ? "status" : "generic";
+  };
+
+  const labelFor = (el) => {
+    const labelledBy = el.getAttribute("aria-labelledby");
+    if (labelledBy) {
+      const text = labelledBy
+        .split(/\\s+/)
+        .map((id) => document.getElementById(id))
+        .filter(Boolean)
+        .map((node) => node.innerText)
+        .join(" ");
+      if (clip(text, 1)) return text;
+    }
+    if (el.labels && el.labels.length) return el.labels[0].innerText;
+    return (
+      el.getAttribute("aria-label") ||
+      el.getAttribute("placeholder") ||
+      el.getAttribute("alt") ||
+      el.getAttribute("title") ||
+      el.getAttribute("name") ||
+      ""
+    );
+  };
+
+  const elements = [];
+  for (const el of document.querySelectorAll(INTERACTIVE)) {
+    if (!isVisible(el)) continue;
+    const element = {
+      selector: selectorFor(el),
+      role: roleFor(el),
+      label: clip(labelFor(el), 80),
+      text: clip(el.innerText || el.value, 80),
+    };
+    if (el.tagName === "SELECT") {
+      element.options = Array.from(el.options)
+        .slice(0, 20)
+        .map((option) => clip(option.value || option.text, 30));
+    }
+    elements.push(element);
+  }
+  return elements;
+}
+"""
+
+
+async def distill_page(page: Page) -> List[Dict[str, Any]]:
+    """
+    Return the interactive and visible elements of the page, each with a CSS
+    selector which resolves to exactly one element, its role, label and text.
+    """
+    return await page.evaluate(DISTILL_SCRIPT)
+
+
+def format_element(element: Dict[str, Any]) -> str:
+    parts = [element["role"], f'selector="{element["selector"]}"']
+    if element.get("label"):
+        parts.append(f'label="{element["label"]}"')
+    if element.get("text") and element.get("text") != element.get("label"):
+        parts.append(f'text="{element["text"]}"')
+    if element.get("options"):
+        parts.append(f'options="{", ".join(element["options"])}"')
+    return " ".join(parts)
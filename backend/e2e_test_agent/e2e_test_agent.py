@@ -1,16 +1,34 @@
-import matplotlib.pyplot as plt
-import matplotlib.image as mpimg
+import asyncio
+import hashlib
 from io import BytesIO
+import logging
+import time
+from typing import List, Optional, Tuple
 
-from playwright.async_api import async_playwright
 from langgraph.graph import END, StateGraph
 
-from e2e_test_agent.decision_generator import decision_generator
-from e2e_test_agent.states import AgentState
-from e2e_test_agent import all_actions
+from e2e_test_agent.decision_generator import (
+    create_page_index,
+    decision_generator,
+    speculative,
+)
+from e2e_test_agent.plan_executor import REPLAN, execute_plan
+from e2e_test_agent.recorder import (
+    has_verified_outcome,
+    is_successful_run,
+    save_compiled_test,
+)
+from e2e_test_agent.run_budget import RunBudget
+from e2e_test_agent.states import ActionStep, AgentState
+from e2e_test_agent import action_dispatcher, all_actions
+from utils.browser_pool import browser_pool
+from utils.config import config
 
 
 def visualize_graph(graph):
+    import matplotlib.pyplot as plt
+    import matplotlib.image as mpimg
+
     image_bytes = graph.get_graph().draw_png()
     image_stream = BytesIO(image_bytes)
     img = mpimg.imread(image_stream, format="png")
@@ -23,54 +41,146 @@ def visualize_graph(graph):
 class E2eTestingAgent:
     def __init__(self) -> None:
         self.e2e_test_graph = None
-
-    async def ainvoke(self, topic: str, show_graph: bool = False):
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False, args=None)
-            page = await browser.new_page()
-
-            if browser is None or page is None:
-                raise Exception(
-                    "Failed to create browser and new page using playwright"
-                )
-
-            initial_state = {"requirement": topic, "page": page}
+        self.stop_reason: Optional[str] = None
+        self.budget: Optional[RunBudget] = None
+        # (node, seconds) of every step of the last run, in order.
+        self.step_timings: List[Tuple[str, float]] = []
+
+    async def ainvoke(
+        self, topic: str, show_graph: bool = False, record_to: Optional[str] = None
+    ) -> List[ActionStep]:
+        """
+        Run the agent against the requirement.
+
+        :param topic: The requirement to be tested.
+        :param show_graph: Whether to show the graph of the agent.
+        :param record_to: If given and the run succeeds with a postcondition which
+            held, the executed actions and their checked postconditions are compiled
+            into a pytest/Playwright module at this path.
+        :return: The steps of the run, in order: the actions executed, the checks
+            of their postconditions as VERIFY steps and an END step when the agent
+            ended the run. When the run is stopped by its budget or a loop, the last
+            step is a failed STOP step carrying the reason, which is also kept in
+            self.stop_reason.
+        """
+        self.stop_reason = None
+        self.step_timings = []
+        self.budget = budget = RunBudget(
+            max_steps=config.agent_max_steps,
+            max_seconds=config.agent_max_seconds,
+            max_tokens=config.agent_max_tokens,
+            max_repeats=config.agent_max_repeats,
+        )
+        # Runs of the same requirement share a HAR, separate from those of the tests.
+        har_name = f"agent-{hashlib.sha1(topic.encode('utf-8')).hexdigest()[:12]}"
+        async with browser_pool.page(har_name) as page:
+            if page is None:
+                raise Exception("Failed to create new page using playwright")
+
+            initial_state = {
+                "requirement": topic,
+                "page": page,
+                "page_index": create_page_index(),
+                "plan": [],
+                "postcondition": None,
+                "speculation": None,
+                "command_cache_key": None,
+                "fast_path_steps": 0,
+                "steps": [],
+            }
 
             e2e_test_graph = await self._build()
 
             if show_graph:
                 visualize_graph(e2e_test_graph)
 
-            final_step = None
-            async for step in e2e_test_graph.astream(initial_state):
-                name = next(iter(step))
-                print(name)
-                print("-- ", str(step[name]["messages"]))
-                if END in step:
-                    final_step = step
-                    break
+            steps: List[ActionStep] = []
+            speculation = None
+
+            async def run_graph():
+                nonlocal speculation
+                step_started_at = time.perf_counter()
+                async for step in e2e_test_graph.astream(
+                    initial_state, config={"callbacks": [budget.usage]}
+                ):
+                    name = next(iter(step))
+                    now = time.perf_counter()
+                    self.step_timings.append((name, now - step_started_at))
+                    step_started_at = now
+                    print(name)
+                    print("-- ", str(step[name].get("messages")))
+                    if "speculation" in step[name]:
+                        speculation = step[name]["speculation"]
+                    for action_step in step[name].get("steps", []):
+                        steps.append(action_step)
+                        budget.record(action_step)
+                    if END in step:
+                        return
+                    self.stop_reason = budget.exceeded()
+                    if self.stop_reason:
+                        return
+
+            # The deadline also stops an LLM call or a page action which hangs.
+            try:
+                await asyncio.wait_for(run_graph(), budget.remaining_seconds())
+            except asyncio.TimeoutError:
+                self.stop_reason = budget.time_limit_reason()
+            finally:
+                if speculation is not None:
+                    speculation.cancel()
+
+            if self.stop_reason:
+                logging.warning(f"Stopping agent run: {self.stop_reason}")
+                steps.append(
+                    ActionStep(
+                        action="STOP",
+                        data={"reason": self.stop_reason},
+                        error=self.stop_reason,
+                    )
+                )
 
-            if not final_step:
-                final_step = step
+        # Only a run with a verified outcome gives a recording which asserts it.
+        if record_to and is_successful_run(steps):
+            if has_verified_outcome(steps):
+                save_compiled_test(steps, record_to, topic)
+                logging.info(f"Recorded successful run to {record_to}")
+            else:
+                logging.warning(
+                    f"Not recording the run to {record_to}: no postcondition held"
+                )
 
-            await browser.close()
+        return steps
 
     async def _build(self):
         builder = StateGraph(AgentState)
 
         decision_generator_key = "decision_generator"
+        plan_executor_key = "plan_executor"
         builder.add_node(decision_generator_key, decision_generator)
+        # In plan mode every action is followed by the plan executor, which runs the
+        # rest of the plan and only goes back to the decision generator to re-plan.
+        after_action_key = decision_generator_key
+        if config.agent_plan_mode:
+            builder.add_node(plan_executor_key, execute_plan)
+            after_action_key = plan_executor_key
         for key in all_actions.keys():
-            builder.add_node(key, all_actions[key].run)
-            builder.add_edge(key, decision_generator_key)
+            node = action_dispatcher.node(key)
+            if config.speculative_retrieval:
+                node = speculative(node)
+            builder.add_node(key, node)
+            builder.add_edge(key, after_action_key)
 
         def route_actions(state: AgentState):
             action = state["action"]
             if action == "END":
                 return END
+            if action == REPLAN:
+                return decision_generator_key
             return action
 
         builder.add_conditional_edges(decision_generator_key, route_actions)
+        if config.agent_plan_mode:
+            builder.add_conditional_edges(plan_executor_key, route_actions)
         builder.set_entry_point(decision_generator_key)
 
         return builder.compile().with_config(run_name="E2E Testing")
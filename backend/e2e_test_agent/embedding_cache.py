@@ -0,0 +1,68 @@
+from array import array
+import asyncio
+import logging
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from e2e_test_agent.page_index import hash_text
+from utils.sqlite_cache import SQLiteCache
+
+
+def _encode(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _decode(value: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(value)
+    return vector.tolist()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that stores document vectors in a SQLiteCache keyed by the
+    model name and the hash of the text, so the same chunks are embedded once
+    across agent runs and processes.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: SQLiteCache):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache
+
+    def _key(self, text: str) -> str:
+        return f"{self.model}:{hash_text(text)}"
+
+    def _lookup(self, texts: List[str]):
+        keys = [self._key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = list(
+            dict.fromkeys(text for text, key in zip(texts, keys) if key not in cached)
+        )
+        logging.debug(
+            f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses"
+        )
+        return keys, cached, missing
+
+    def _merge(self, keys, cached, missing, vectors) -> List[List[float]]:
+        computed = {self._key(text): _encode(v) for text, v in zip(missing, vectors)}
+        self.cache.set_many(computed)
+        cached.update(computed)
+        return [_decode(cached[key]) for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = self._lookup(texts)
+        vectors = self.embeddings.embed_documents(missing) if missing else []
+        return self._merge(keys, cached, missing, vectors)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, cached, missing = await asyncio.to_thread(self._lookup, texts)
+        vectors = await self.embeddings.aembed_documents(missing) if missing else []
+        return await asyncio.to_thread(self._merge, keys, cached, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
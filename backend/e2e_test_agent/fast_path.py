@@ -0,0 +1,120 @@
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from playwright.async_api import Page
+
+from e2e_test_agent.dom_distiller import distill_page
+from e2e_test_agent.states import VERIFY, AgentState
+
+# Only URLs the requirement asks to go to, not e.g. a video URL to be uploaded.
+NAVIGATE_PATTERN = re.compile(
+    r"\b(?:navigate|go|open|visit|browse)(?:\s+to)?(?:\s+the)?(?:\s+page)?\s+"
+    r"(?P<url>https?://[^\s'\"<>]+)",
+    re.IGNORECASE,
+)
+CLAUSE_SEPARATOR = re.compile(r"\bthen\b|;|\n", re.IGNORECASE)
+CLICK_PATTERN = re.compile(
+    r"^(?:and\s+)?click(?:\s+on)?(?:\s+the)?\s+(?P<target>.+?)"
+    r"(?:\s+(?:button|link|tab|checkbox|element))?$",
+    re.IGNORECASE,
+)
+TYPE_PATTERN = re.compile(
+    r"^(?:and\s+)?(?:type|enter)\s+[\"'](?P<text>[^\"']*)[\"']\s+"
+    r"(?:in|into)(?:\s+the)?\s+(?P<target>.+?)(?:\s+(?:field|input|box))?$",
+    re.IGNORECASE,
+)
+
+
+class FastCommand(NamedTuple):
+    action: str
+    data: Dict[str, Any]
+    description: str
+
+
+def split_clauses(requirement: str) -> List[str]:
+    return [
+        clause.strip(" .,")
+        for clause in CLAUSE_SEPARATOR.split(requirement)
+        if clause.strip(" .,")
+    ]
+
+
+def _unquote(text: str) -> str:
+    return text.strip().strip("\"'").strip()
+
+
+def find_unique_element(
+    elements: List[Dict[str, Any]], target: str
+) -> Optional[Dict[str, Any]]:
+    """Return the only element whose label or text is exactly the target, if any."""
+    target = target.casefold()
+    matches = [
+        element
+        for element in elements
+        if target
+        in (element.get("label", "").casefold(), element.get("text", "").casefold())
+    ]
+    return matches[0] if len(matches) == 1 else None
+
+
+async def fast_path(state: AgentState) -> Optional[FastCommand]:
+    """
+    Decide the next action by rules, without any embedding or LLM call, when it is
+    obvious from the requirement: the first step navigates to the URL of the
+    requirement, and a "click X" or "type 'text' into X" clause is handled when X is
+    exactly the label or text of a single element of the page. The requirement is
+    split into clauses on "then" and the clause to handle is the one after those it
+    handled so far. Returns None whenever the rules are not sure.
+    """
+    steps = [step for step in state.get("steps") or [] if step.action != VERIFY]
+    if any(not step.succeeded for step in steps):
+        return None
+    # Steps only line up with clauses while the fast path took every one of them;
+    # a clause the model handled may have taken several actions.
+    if len(steps) != (state.get("fast_path_steps") or 0):
+        return None
+
+    requirement = state["requirement"]
+    if not steps:
+        urls = {url.rstrip(".,;)") for url in NAVIGATE_PATTERN.findall(requirement)}
+        if len(urls) == 1:
+            url = urls.pop()
+            return FastCommand("navigate_page", {"url": url}, f"Navigate to {url}.")
+        return None
+
+    clauses = split_clauses(requirement)
+    if len(steps) >= len(clauses):
+        return None
+    clause = clauses[len(steps)]
+
+    type_match = TYPE_PATTERN.match(clause)
+    click_match = None if type_match else CLICK_PATTERN.match(clause)
+    if not type_match and not click_match:
+        return None
+
+    page: Page = state["page"]
+    try:
+        elements = await distill_page(page)
+    except Exception as e:
+        print(f"Failed to distill page for the fast path: {e}")
+        return None
+
+    if type_match:
+        element = find_unique_element(elements, _unquote(type_match["target"]))
+        if element is None or element["role"] != "textbox":
+            return None
+        text = type_match["text"]
+        return FastCommand(
+            "type_text",
+            {"selector": element["selector"], "text": text},
+            f"Type {text} to {element['selector']}.",
+        )
+
+    element = find_unique_element(elements, _unquote(click_match["target"]))
+    if element is None:
+        return None
+    return FastCommand(
+        "click_element",
+        {"selector": element["selector"]},
+        f"Click {element['selector']}.",
+    )
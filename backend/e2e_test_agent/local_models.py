@@ -0,0 +1,185 @@
+"""
+Deterministic local stand-ins for the chat and embedding models, selected with
+MODEL_BACKEND=local. They need no network, so the agent loop can be measured and
+regression-tested offline; their decisions are simple heuristics, not a replacement
+for the real models.
+"""
+
+from functools import partial
+import hashlib
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from e2e_test_agent.states import estimate_tokens
+
+REQUIREMENT_PATTERN = re.compile(r"Requirement: (.*?)(?:\nPage Parts:|$)", re.DOTALL)
+ELEMENT_PATTERN = re.compile(
+    r'^(?P<role>\S+) selector="(?P<selector>[^"]*)"'
+    r'(?: label="(?P<label>[^"]*)")?(?: text="(?P<text>[^"]*)")?',
+    re.MULTILINE,
+)
+URL_PATTERN = re.compile(r"https?://[^\s'\"<>]+")
+FILE_PATH_PATTERN = re.compile(
+    r"synthetic:[\w.+]+\.\w+|(?:\.{0,2}/)?(?:[\w.-]+/)+[\w.-]+\.\w+"
+)
+QUOTED_PATTERN = re.compile(r"[\"']([^\"']+)[\"']")
+WORD_PATTERN = re.compile(r"[a-z0-9]{3,}")
+CLICKABLE_ROLES = {"button", "link", "checkbox", "radio", "tab", "menuitem"}
+# Verbs of the requirement which refer to an element of the role.
+ROLE_WORDS = {
+    "file": {"upload", "file", "choose", "select"},
+    "textbox": {"type", "enter", "fill"},
+    **{role: {"click", "press"} for role in CLICKABLE_ROLES},
+}
+
+
+def _words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+class LocalChatModel(BaseChatModel):
+    """
+    Chat model which answers without any network call. Plain calls echo the
+    requirement, which is what the DOM hint is used for. Structured output acts on the
+    page part which was not acted on yet and is referred to earliest in the
+    requirement, by its label, text or a verb of its role, and answers END when
+    there is none left.
+    """
+
+    @property
+    def _llm_type(self) -> str:
+        return "local"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        structured_schema: Optional[str] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        requirement_match = REQUIREMENT_PATTERN.search(prompt)
+        requirement = requirement_match[1].strip() if requirement_match else prompt
+        if structured_schema is None:
+            content = requirement
+        else:
+            command = self._decide(requirement, prompt, messages)
+            if structured_schema == "Plan":
+                command = {"actions": [command]}
+            content = json.dumps(command)
+
+        input_tokens = estimate_tokens(prompt)
+        output_tokens = estimate_tokens(content)
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    @staticmethod
+    def _decide(
+        requirement: str, prompt: str, messages: List[BaseMessage]
+    ) -> Dict[str, Any]:
+        history = " ".join(
+            str(message.content) for message in messages if message.type == "ai"
+        )
+        urls = URL_PATTERN.findall(requirement)
+        if urls and "Navigated to" not in history:
+            url = urls[0].rstrip(".,;)")
+            return {
+                "action": "navigate_page",
+                "data": {"url": url},
+                "description": f"Navigate to {url}",
+            }
+
+        requirement_words = _words(URL_PATTERN.sub("", requirement))
+        file_paths = FILE_PATH_PATTERN.findall(URL_PATTERN.sub("", requirement))
+        quoted = QUOTED_PATTERN.findall(requirement)
+        best, best_rank = None, None
+        for element in ELEMENT_PATTERN.finditer(prompt):
+            selector = element["selector"]
+            if selector in history:
+                continue
+            role = element["role"]
+            if role == "file" and file_paths:
+                command = {
+                    "action": "input_file",
+                    "data": {"selector": selector, "file_path": file_paths[0]},
+                }
+            elif role == "textbox" and quoted:
+                command = {
+                    "action": "type_text",
+                    "data": {"selector": selector, "text": quoted[0]},
+                }
+            elif role in CLICKABLE_ROLES:
+                command = {"action": "click_element", "data": {"selector": selector}}
+            else:
+                continue
+            element_words = set(
+                _words(f"{element['label'] or ''} {element['text'] or ''} {role}")
+            )
+            positions = [
+                position
+                for position, word in enumerate(requirement_words)
+                if word in element_words or word in ROLE_WORDS.get(role, ())
+            ]
+            if not positions:
+                continue
+            rank = (min(positions), -len(positions))
+            if best_rank is None or rank < best_rank:
+                best, best_rank = command, rank
+
+        if best is None:
+            return {"action": "END", "data": {}, "description": "Nothing left to do"}
+        best["description"] = f"{best['action']} {best['data']['selector']}"
+        return best
+
+    def with_structured_output(self, schema, **kwargs: Any):
+        return self.bind(structured_schema=schema.__name__) | RunnableLambda(
+            partial(_parse_structured_output, schema)
+        )
+
+
+def _parse_structured_output(schema, message: AIMessage):
+    return schema.parse_raw(message.content)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Embeds text by hashing its words into a fixed number of signed buckets and
+    normalizing the result, so that texts sharing words are close to each other.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = int.from_bytes(
+                hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big"
+            )
+            vector[digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
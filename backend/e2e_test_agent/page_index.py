@@ -0,0 +1,122 @@
+import hashlib
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from playwright.async_api import Page
+
+if TYPE_CHECKING:
+    from langchain_core.vectorstores import VectorStoreRetriever
+    from langchain_text_splitters import TextSplitter
+
+from e2e_test_agent.dom_distiller import distill_page, format_element
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that remembers the vector of every chunk it has embedded,
+    keyed by the hash of the chunk text. Only chunks that were never seen before
+    are sent to the underlying embedding model.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self.vectors: Dict[str, List[float]] = {}
+
+    def _missing(self, texts: List[str]) -> List[str]:
+        return list(
+            dict.fromkeys(text for text in texts if hash_text(text) not in self.vectors)
+        )
+
+    def _store(self, texts: List[str], vectors: List[List[float]]):
+        for text, vector in zip(texts, vectors):
+            self.vectors[hash_text(text)] = vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        missing = self._missing(texts)
+        if missing:
+            self._store(missing, self.embeddings.embed_documents(missing))
+        return [self.vectors[hash_text(text)] for text in texts]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        missing = self._missing(texts)
+        if missing:
+            self._store(missing, await self.embeddings.aembed_documents(missing))
+        return [self.vectors[hash_text(text)] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.embeddings.aembed_query(text)
+
+
+class PageIndex:
+    """
+    Per-run index of the page under test.
+
+    The page is distilled into its interactive and visible elements, one per line,
+    and that list is what gets chunked; the raw HTML is only used when the page
+    cannot be distilled. The retriever is rebuilt only when the distilled content
+    changes between steps, and when it is rebuilt only the chunks which were not
+    embedded earlier in the run cost an embedding call.
+    """
+
+    def __init__(self, embeddings: Embeddings, splitter: "TextSplitter", k: int = 4):
+        self.embeddings = ChunkEmbeddings(embeddings)
+        self.splitter = splitter
+        self.k = k
+        self.content_hash: Optional[str] = None
+        # Content distilled by the last indexing, None while it has not distilled.
+        self.content: Optional[str] = None
+        self.retriever: Optional["VectorStoreRetriever"] = None
+
+    async def page_content(self, page: Page) -> str:
+        """
+        Distill the page, without touching the index, so it can run next to an
+        indexing of the page.
+        """
+        try:
+            elements = await distill_page(page)
+        except Exception as e:
+            print(f"Failed to distill page, indexing raw HTML instead: {e}")
+            elements = []
+        if elements:
+            return "\n".join(format_element(element) for element in elements)
+        return await page.content()
+
+    async def aretriever(
+        self, page: Page, page_content: Optional[str] = None
+    ) -> Optional["VectorStoreRetriever"]:
+        """
+        Return the retriever over the page, rebuilt when its content changed.
+
+        :param page: The page under test.
+        :param page_content: The content of the page when it was just distilled.
+        """
+        self.content = None
+        if page_content is None:
+            page_content = await self.page_content(page)
+        self.content = page_content
+        content_hash = hash_text(page_content)
+        if content_hash == self.content_hash:
+            return self.retriever
+
+        chunks = list(dict.fromkeys(self.splitter.split_text(page_content)))
+        if not chunks:
+            return None
+
+        from langchain_community.vectorstores import SKLearnVectorStore
+
+        await self.embeddings.aembed_documents(chunks)
+        vectorstore = await SKLearnVectorStore.afrom_texts(
+            chunks, embedding=self.embeddings
+        )
+        self.content_hash = content_hash
+        self.retriever = vectorstore.as_retriever(
+            search_kwargs={"k": min(self.k, len(chunks))}
+        )
+        return self.retriever
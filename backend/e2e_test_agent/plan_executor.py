@@ -0,0 +1,112 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+from langchain_core.messages import AIMessage
+from playwright.async_api import Page
+
+from e2e_test_agent.command_cache import invalidate_cached_command
+from e2e_test_agent.states import VERIFY, ActionStep, AgentState
+from utils.config import config
+
+# Action returned by the plan executor when the decision generator has to plan again.
+REPLAN = "REPLAN"
+
+
+async def check_postcondition(page: Page, postcondition, timeout: float) -> bool:
+    """
+    Wait up to timeout seconds for the postcondition of an action to hold.
+
+    :param page: The page the action was performed on.
+    :param postcondition: The postcondition planned with the action, if any.
+    :param timeout: How long to wait for the page to settle, in seconds.
+    """
+    if postcondition is None:
+        return True
+
+    kind, value = postcondition.kind, postcondition.value
+    try:
+        if kind == "selector_visible":
+            await page.wait_for_selector(value, state="visible", timeout=timeout * 1000)
+        elif kind == "url_contains":
+            deadline = asyncio.get_running_loop().time() + timeout
+            while value not in page.url:
+                if asyncio.get_running_loop().time() >= deadline:
+                    return False
+                await asyncio.sleep(0.1)
+        elif kind == "text_visible":
+            await page.get_by_text(value).first.wait_for(
+                state="visible", timeout=timeout * 1000
+            )
+        else:
+            print(f"Unknown postcondition kind {kind}, skipping check")
+        return True
+    except Exception as e:
+        print(f"Postcondition {kind}={value!r} did not hold: {e}")
+        return False
+
+
+def verify_step(postcondition, held: bool) -> ActionStep:
+    """Record the check of a postcondition, so a recorded run can assert it."""
+    error = None
+    if not held:
+        error = f"Expected {postcondition.kind} {postcondition.value!r} to hold"
+    return ActionStep(
+        action=VERIFY,
+        data={"kind": postcondition.kind, "value": postcondition.value},
+        error=error,
+    )
+
+
+async def execute_plan(state: AgentState) -> Optional[Dict[str, Any]]:
+    """
+    Continue with the next planned action while the last one succeeded and its
+    postcondition holds, otherwise hand over to the decision generator to plan again.
+    Every checked postcondition is added to the steps.
+    """
+    steps = state.get("steps") or []
+    if steps and not steps[-1].succeeded:
+        await invalidate_cached_command(state)
+        return {
+            "action": REPLAN,
+            "plan": [],
+            "postcondition": None,
+            "command_cache_key": None,
+        }
+
+    postcondition = state.get("postcondition")
+    held = await check_postcondition(
+        state["page"], postcondition, config.postcondition_timeout
+    )
+    verified = [] if postcondition is None else [verify_step(postcondition, held)]
+    if not held:
+        await invalidate_cached_command(state)
+        ai_message = AIMessage(
+            content=(
+                f"Expected {postcondition.kind} {postcondition.value!r} after the "
+                "last action, but it did not hold."
+            )
+        )
+        return {
+            "action": REPLAN,
+            "plan": [],
+            "postcondition": None,
+            "command_cache_key": None,
+            "messages": [ai_message],
+            "steps": verified,
+        }
+
+    plan = state.get("plan") or []
+    if not plan:
+        return {"action": REPLAN, "postcondition": None, "steps": verified}
+
+    planned, *rest = plan
+    if planned.action == "END":
+        verified.append(ActionStep(action="END", data={}))
+    return {
+        "action": planned.action,
+        "data": planned.data,
+        "postcondition": planned.postcondition,
+        "plan": rest,
+        "messages": [AIMessage(content=planned.description)],
+        "steps": verified,
+    }
@@ -0,0 +1,120 @@
+import os
+import re
+from typing import List
+
+from e2e_test_agent.states import VERIFY, ActionStep
+from utils.video_fixtures import SYNTHETIC_PREFIX
+
+TEST_TEMPLATE = """import pytest
+
+from utils.browser_pool import browser_pool
+{imports}
+REQUIREMENT = {requirement!r}
+
+
+@pytest.mark.asyncio
+async def {test_name}():
+    async with browser_pool.page() as page:
+        try:{body}
+
+            print("Recorded run passed.")
+        except Exception as e:
+            print("Recorded run failed. " + str(e))
+            raise e
+"""
+
+
+# Assertions of the postconditions which held during a run, by kind.
+ASSERTIONS = {
+    "selector_visible": 'await page.wait_for_selector({value!r}, state="visible")',
+    "url_contains": "await page.wait_for_url(lambda url: {value!r} in url)",
+    "text_visible": 'await page.get_by_text({value!r}).first.wait_for(state="visible")',
+}
+
+
+def is_successful_run(steps: List[ActionStep]) -> bool:
+    """
+    A run is successful when the agent ended it with END after executing actions,
+    and neither the last action nor the check of its postcondition failed.
+    """
+    if not steps or steps[-1].action != "END" or not steps[-1].succeeded:
+        return False
+    actions = [i for i, step in enumerate(steps) if step.action not in (VERIFY, "END")]
+    return bool(actions) and all(step.succeeded for step in steps[actions[-1] :])
+
+
+def has_verified_outcome(steps: List[ActionStep]) -> bool:
+    """Whether a postcondition held during the run, which the recording can assert."""
+    return any(
+        step.action == VERIFY and step.succeeded and step.data["kind"] in ASSERTIONS
+        for step in steps
+    )
+
+
+def _compile_step(step: ActionStep) -> List[str]:
+    data = step.data
+    if step.action == "END":
+        return []
+    if step.action == VERIFY:
+        if data["kind"] not in ASSERTIONS:
+            return []
+        message = f"Checking {data['kind']} {data['value']}."
+        call = ASSERTIONS[data["kind"]].format(value=data["value"])
+    elif step.action == "navigate_page":
+        message = f"Navigating to {data['url']}."
+        call = f"await page.goto({data['url']!r})"
+    elif step.action == "click_element":
+        message = f"Clicking {data['selector']}."
+        call = f"await page.click({data['selector']!r})"
+    elif step.action == "type_text":
+        message = f"Typing text to {data['selector']}."
+        call = f"await page.fill({data['selector']!r}, {data['text']!r})"
+    elif step.action == "input_file":
+        message = f"Setting input file {data['file_path']}."
+        file_path = repr(data["file_path"])
+        if data["file_path"].startswith(SYNTHETIC_PREFIX):
+            file_path = f"resolve_file_path({file_path})"
+        call = f"await page.set_input_files({data['selector']!r}, {file_path})"
+    else:
+        raise ValueError(f"Can't compile action: {step.action}")
+    return [f"print({message!r})", call]
+
+
+def compile_test(steps: List[ActionStep], test_name: str, requirement: str) -> str:
+    """
+    Compile the successful steps of an agent run into a pytest/Playwright module
+    which replays them without any LLM or embedding calls, and asserts the
+    postconditions which held after them.
+
+    :param steps: The steps executed by the agent, in order.
+    :param test_name: The name of the test function, must start with 'test_'.
+    :param requirement: The requirement the agent was given, kept for self-healing.
+    :return: The source code of the test module.
+    """
+    lines = []
+    for step in steps:
+        compiled = _compile_step(step) if step.succeeded else []
+        if compiled:
+            lines.append("")
+            lines.extend(compiled)
+    body = "\n".join(f"            {line}" if line else "" for line in lines)
+    imports = ""
+    if "resolve_file_path(" in body:
+        imports = "from utils.video_fixtures import resolve_file_path\n"
+    return TEST_TEMPLATE.format(
+        requirement=requirement, test_name=test_name, body=body, imports=imports
+    )
+
+
+def save_compiled_test(steps: List[ActionStep], path: str, requirement: str) -> str:
+    """Compile the steps into a test module at path, named after the file."""
+    test_name = re.sub(r"\W", "_", os.path.splitext(os.path.basename(path))[0])
+    if not test_name.startswith("test_"):
+        test_name = f"test_{test_name}"
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as file:
+        file.write(compile_test(steps, test_name, requirement))
+    return path
@@ -0,0 +1,97 @@
+from collections import Counter
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from e2e_test_agent.states import VERIFY, ActionStep
+
+
+class TokenUsage(BaseCallbackHandler):
+    """Callback handler which adds up the tokens used by every chat model call of a run."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.total_tokens = 0
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any):
+        tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                tokens += usage.get("total_tokens", 0)
+        if not tokens:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            tokens = token_usage.get("total_tokens", 0)
+        self.total_tokens += tokens
+
+
+class RunBudget:
+    """
+    Limits of a single agent run: the number of actions, the wall time and the tokens
+    spent, plus loop detection. The same action on the same target repeating
+    max_repeats times in a row, or the same failure max_repeats times, stops the run.
+    A postcondition which held counts as progress and ends a row of repeats.
+    """
+
+    def __init__(
+        self, max_steps: int, max_seconds: float, max_tokens: int, max_repeats: int
+    ):
+        self.max_steps = max_steps
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_repeats = max_repeats
+        self.usage = TokenUsage()
+        self.started_at = time.monotonic()
+        self.steps = 0
+        self.last_action: Optional[Tuple] = None
+        self.repeats = 0
+        self.failures: Counter = Counter()
+
+    @staticmethod
+    def _signature(step: ActionStep) -> Tuple:
+        data: Dict[str, Any] = step.data
+        return (step.action, data.get("selector") or data.get("url"), data.get("text"))
+
+    def record(self, step: ActionStep):
+        if not step.succeeded:
+            self.failures[step.error] += 1
+        if step.action == VERIFY:
+            if step.succeeded:
+                self.repeats = 0
+            return
+        if step.action == "END":
+            return
+        self.steps += 1
+        signature = self._signature(step)
+        self.repeats = self.repeats + 1 if signature == self.last_action else 1
+        self.last_action = signature
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, self.max_seconds - (time.monotonic() - self.started_at))
+
+    def time_limit_reason(self) -> str:
+        return f"Reached the limit of {self.max_seconds:g} seconds"
+
+    def exceeded(self) -> Optional[str]:
+        """Return why the run has to stop, or None while it is within its budget."""
+        if self.steps >= self.max_steps:
+            return f"Reached the limit of {self.max_steps} actions"
+        if self.remaining_seconds() <= 0:
+            return self.time_limit_reason()
+        if self.usage.total_tokens >= self.max_tokens:
+            return (
+                f"Used {self.usage.total_tokens} tokens, over the limit of "
+                f"{self.max_tokens}"
+            )
+        if self.repeats >= self.max_repeats:
+            action, target, _ = self.last_action
+            return f"Repeated {action} on {target} {self.repeats} times in a row"
+        if self.failures:
+            error, count = self.failures.most_common(1)[0]
+            if count >= self.max_repeats:
+                return f"Failed {count} times with the same error: {error}"
+        return None
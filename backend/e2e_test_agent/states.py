@@ -1,8 +1,17 @@
-from typing import Annotated, Any, Dict, List, TypedDict
+from dataclasses import dataclass
+from typing import Annotated, Any, Dict, List, Optional, TypedDict
 
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import AIMessage, BaseMessage
 from playwright.async_api import Page
 
+from e2e_test_agent.page_index import PageIndex
+from utils.config import config
+
+# Name of the message which summarizes the messages folded out of the history.
+SUMMARY_NAME = "history_summary"
+SUMMARY_HEADER = "Summary of what was done earlier in this run:"
+SUMMARY_OMITTED = "- (older entries omitted)"
+
 
 def add_messages(left, right):
     if not isinstance(left, list):
@@ -12,9 +21,90 @@ def add_messages(left, right):
     return left + right
 
 
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def _summary_line(message: BaseMessage) -> str:
+    content = " ".join(str(message.content).split())
+    if len(content) > 200:
+        content = content[:197] + "..."
+    return f"- {message.type}: {content}"
+
+
+def compact_messages(
+    messages: List[BaseMessage], keep: int, token_budget: int
+) -> List[BaseMessage]:
+    """
+    Keep the last `keep` messages as they are and fold the older ones into a single
+    summary message, one line per message. The oldest lines of the summary are
+    dropped once it is estimated to exceed token_budget tokens.
+    """
+    lines: List[str] = []
+    omitted = False
+    rest = messages
+    if messages and getattr(messages[0], "name", None) == SUMMARY_NAME:
+        lines = messages[0].content.splitlines()[1:]
+        omitted = SUMMARY_OMITTED in lines
+        lines = [line for line in lines if line != SUMMARY_OMITTED]
+        rest = messages[1:]
+    if len(rest) <= keep:
+        return messages
+
+    split = len(rest) - keep
+    lines.extend(_summary_line(message) for message in rest[:split])
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > token_budget:
+        lines.pop(0)
+        omitted = True
+    if omitted:
+        lines.insert(0, SUMMARY_OMITTED)
+
+    summary = AIMessage(content="\n".join([SUMMARY_HEADER, *lines]), name=SUMMARY_NAME)
+    return [summary, *rest[split:]]
+
+
+def add_compacted_messages(left, right):
+    """Append the messages and, in history compaction mode, bound the history."""
+    messages = add_messages(left, right)
+    if not config.history_compaction:
+        return messages
+    return compact_messages(
+        messages, config.history_keep_messages, config.history_token_budget
+    )
+
+
+# Step which records whether the postcondition of the action before it held.
+VERIFY = "VERIFY"
+
+
+@dataclass
+class ActionStep:
+    """An action executed by the agent, with the data it was executed with."""
+
+    action: str
+    data: Dict[str, Any]
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
 class AgentState(TypedDict):
     page: Page
+    page_index: PageIndex
     action: str
     data: Dict[str, Any]
+    # Postcondition of the current action and the actions left of the plan, when the
+    # decision generator returned a plan instead of a single command.
+    postcondition: Optional[Any]
+    plan: List[Any]
+    # Hint and page index for the next decision, started while the last action ran.
+    speculation: Optional[Any]
+    # Key of the cached decision the current action came from.
+    command_cache_key: Optional[str]
+    # Steps decided by the fast path, which only goes on while it decided them all.
+    fast_path_steps: int
     requirement: str
-    messages: Annotated[List[BaseMessage], add_messages]
+    messages: Annotated[List[BaseMessage], add_compacted_messages]
+    steps: Annotated[List[ActionStep], add_messages]
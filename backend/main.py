@@ -1,28 +1,143 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
-from fastapi.responses import FileResponse
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
 import logging
 
-from tests import run_test
-from utils.csv_report import generate_csv_report
-from utils.db import fetch_test_cases, fetch_test_logs, init_db, reset_all_test_cases
+from utils.csv_report import REPORT_FORMATS, describe_failures, iter_report
+from utils.db import (
+    compact_test_runs,
+    fetch_job,
+    fetch_pass_rate,
+    fetch_suite_run,
+    fetch_test_cases,
+    fetch_test_logs,
+    fetch_test_results_run_key,
+    fetch_test_runs,
+    init_db,
+    purge_old_logs,
+    reset_all_test_cases,
+)
+from utils.browser_server import browser_servers
+from utils.config import config
+from utils.log_stream import log_broadcaster
+from utils.network_policy import network_policy
+from utils.scheduler import scheduler
+from utils.sqlite_cache import embedding_cache
 from tests import tests
 
 init_db()
 
-app = FastAPI()
+
+async def purge_logs_periodically(interval: float = 60 * 60):
+    while True:
+        try:
+            deleted = await asyncio.to_thread(purge_old_logs, config.log_retention_days)
+            if deleted:
+                logging.info(f"Purged {deleted} test logs past retention")
+        except Exception as e:
+            logging.error(f"Error purging old test logs: {e}")
+        await asyncio.sleep(interval)
+
+
+async def compact_runs_periodically(interval: float = 60 * 60):
+    while True:
+        try:
+            compacted = await asyncio.to_thread(
+                compact_test_runs, config.run_history_full_runs
+            )
+            if compacted:
+                logging.info(f"Compacted {compacted} old test runs")
+        except Exception as e:
+            logging.error(f"Error compacting old test runs: {e}")
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.browser_servers > 0:
+        try:
+            await asyncio.to_thread(browser_servers.start)
+        except Exception as e:
+            logging.error(f"Failed to start browser servers: {e}")
+    scheduler.start()
+    tasks = []
+    if config.log_retention_days > 0:
+        tasks.append(asyncio.create_task(purge_logs_periodically()))
+    if config.run_history_full_runs > 0:
+        tasks.append(asyncio.create_task(compact_runs_periodically()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await scheduler.stop()
+    await asyncio.to_thread(browser_servers.stop)
+
+
+app = FastAPI(lifespan=lifespan)
 logging.basicConfig(level=logging.INFO)
 
 
 @app.get("/trigger-tests/{test_id}")
-async def trigger_tests(test_id: int, background_tasks: BackgroundTasks):
+async def trigger_tests(test_id: int, priority: int = 0):
+    if str(test_id) not in tests:
+        raise HTTPException(status_code=404, detail="Test not found")
     try:
-        background_tasks.add_task(run_test, test_id)
-        return {"message": f"Test suite with test_id {test_id} initiated"}
+        job = await scheduler.submit(test_id, priority)
+        return {
+            "message": f"Test suite with test_id {test_id} initiated",
+            "job_id": job["id"],
+            "status": job["status"],
+        }
     except Exception as e:
         logging.error(f"Error triggering tests for test_id {test_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to trigger tests")
 
 
+@app.get("/trigger-suite")
+async def trigger_suite(priority: int = 0):
+    try:
+        suite = await scheduler.submit_suite(
+            [int(test_id) for test_id in tests], priority
+        )
+        return {
+            "message": "Test suite initiated",
+            "suite_run_id": suite["suite_run_id"],
+            "job_ids": [job["id"] for job in suite["jobs"]],
+        }
+    except Exception as e:
+        logging.error(f"Error triggering test suite: {e}")
+        raise HTTPException(status_code=500, detail="Failed to trigger test suite")
+
+
+@app.get("/suite-runs/{suite_run_id}")
+async def get_suite_run(suite_run_id: int):
+    suite_run = fetch_suite_run(suite_run_id)
+    if suite_run is None:
+        raise HTTPException(status_code=404, detail="Suite run not found")
+    return {"data": suite_run}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: int):
+    job = fetch_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"data": job}
+
+
+@app.get("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int):
+    try:
+        job = await scheduler.cancel(job_id)
+    except Exception as e:
+        logging.error(f"Error cancelling job {job_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to cancel job")
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"message": "success"}
+
+
 @app.get("/test-cases")
 async def get_test_results():
     try:
@@ -33,16 +148,62 @@ async def get_test_results():
         raise HTTPException(status_code=500, detail="Failed to fetch test cases")
 
 
+@app.get("/test-runs/{test_id}")
+async def get_test_runs(test_id: int, limit: int = 20, before_id: Optional[int] = None):
+    if str(test_id) not in tests:
+        raise HTTPException(status_code=404, detail="Test not found")
+    try:
+        return {"data": fetch_test_runs(test_id, min(limit, 100), before_id)}
+    except Exception as e:
+        logging.error(f"Error fetching test runs for test_id {test_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch test runs")
+
+
+@app.get("/pass-rate")
+async def get_pass_rate(test_id: Optional[int] = None, days: int = 30):
+    try:
+        return {"data": fetch_pass_rate(test_id, days)}
+    except Exception as e:
+        logging.error(f"Error fetching pass rate: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch pass rate")
+
+
 @app.get("/test-logs/{test_id}")
-async def get_test_logs(test_id: int):
+async def get_test_logs(
+    test_id: int,
+    since_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    run_id: Optional[int] = None,
+):
     try:
-        test_logs = fetch_test_logs(test_id)
-        return {"data": test_logs}
+        limit = min(limit or config.log_page_size, config.log_page_size)
+        test_logs = fetch_test_logs(test_id, since_id, limit, run_id)
+        next_cursor = test_logs[-1]["id"] if test_logs else since_id
+        return {
+            "data": test_logs,
+            "next_cursor": next_cursor,
+            "has_more": len(test_logs) == limit,
+        }
     except Exception as e:
         logging.error(f"Error fetching test logs for test_id {test_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch test logs")
 
 
+@app.get("/test-logs/{test_id}/stream")
+async def stream_test_logs(
+    test_id: int,
+    since_id: Optional[int] = None,
+    last_event_id: Optional[int] = Header(None),
+):
+    if str(test_id) not in tests:
+        raise HTTPException(status_code=404, detail="Test not found")
+    return StreamingResponse(
+        log_broadcaster.subscribe(test_id, last_event_id or since_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/test-reset-all")
 async def reset_all_tests():
     try:
@@ -54,12 +215,57 @@ async def reset_all_tests():
 
 
 @app.get("/download-test-report/{test_id}")
-async def generate_report(test_id: int):
+async def generate_report(
+    test_id: int,
+    format: str = "csv",
+    if_none_match: Optional[str] = Header(None),
+):
+    if format not in REPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported report format")
+    if fetch_test_results_run_key(test_id) is None:
+        raise HTTPException(status_code=404, detail="Test has no results yet")
+
     try:
-        csv_path = generate_csv_report(test_id)
-        return FileResponse(
-            csv_path, media_type="text/csv", filename=f"{tests[str(test_id)]}.csv"
+        await describe_failures(test_id)
+        # Failures which could not be described are retried on the next download,
+        # so the tag changes once they are.
+        run_key, described = fetch_test_results_run_key(test_id)
+        etag = f'"{run_key}-{described}-{format}"'
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        return StreamingResponse(
+            iter_report(test_id, format),
+            media_type=REPORT_FORMATS[format],
+            headers={
+                "ETag": etag,
+                "Content-Disposition": (
+                    f'attachment; filename="{tests[str(test_id)]}.{format}"'
+                ),
+            },
         )
     except Exception as e:
         logging.error(f"Error generating report for test_id {test_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate report")
+
+
+@app.get("/embedding-cache/stats")
+async def get_embedding_cache_stats():
+    try:
+        return {"data": embedding_cache.stats()}
+    except Exception as e:
+        logging.error(f"Error fetching embedding cache stats: {e}")
+        raise HTTPException(
+            status_code=500, detail="Failed to fetch embedding cache stats"
+        )
+
+
+@app.get("/network-policy/stats")
+async def get_network_policy_stats():
+    try:
+        return {"data": network_policy.stats()}
+    except Exception as e:
+        logging.error(f"Error fetching network policy stats: {e}")
+        raise HTTPException(
+            status_code=500, detail="Failed to fetch network policy stats"
+        )
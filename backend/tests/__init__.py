@@ -1,8 +1,18 @@
+import asyncio
 import logging
 import multiprocessing
+import os
+import signal
+import threading
 from logging.handlers import QueueHandler, QueueListener
-from e2e_test_agent.e2e_test_agent import E2eTestingAgent
-from utils.db import delete_test_logs, update_test_case_status
+from utils.config import config
+from utils.db import (
+    create_test_run,
+    fetch_test_case,
+    finish_test_run,
+    update_test_case_status,
+)
+from utils.junit_ingest import ingest_junit_xml
 from utils.log_handler import SQLiteHandler
 import subprocess
 
@@ -13,70 +23,164 @@ tests = {
 }
 
 
-def test_process(queue, test_id):
-    queue_handler = QueueHandler(queue)
-    sqlite_handler = SQLiteHandler(test_id)
-    listener = QueueListener(queue, sqlite_handler)
+def _log_lines(stream, log, name):
+    """Log every line of a pipe as soon as it is read, tagged with its stream."""
+    for line in stream:
+        log(line.rstrip(), extra={"stream": name})
+    stream.close()
 
+
+def _kill_process_tree(process):
+    """Kill the test subprocess together with the browsers it started."""
     try:
-        logger = logging.getLogger()
-        logger.setLevel(logging.NOTSET)
-        logger.addHandler(queue_handler)
-        listener.start()
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError):
+        process.kill()
 
-        pytest_args = [
+
+def _exit_on_sigterm(signum, frame):
+    raise SystemExit(f"Test process terminated by signal {signum}")
+
+
+def _run_pytest(logger, test_path, xml_path) -> int:
+    """Run pytest on the module with its output logged line by line."""
+    process = subprocess.Popen(
+        [
             "pytest",
             "-s",
             "--disable-warnings",
-            f"--junitxml=tmp/{tests[str(test_id)]}.xml",
-            f"tests/{tests[str(test_id)]}.py",
+            f"--junitxml={xml_path}",
+            test_path,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True,
+    )
+    try:
+        readers = [
+            threading.Thread(
+                target=_log_lines, args=(process.stdout, logger.info, "stdout")
+            ),
+            threading.Thread(
+                target=_log_lines, args=(process.stderr, logger.error, "stderr")
+            ),
         ]
+        for reader in readers:
+            reader.start()
 
-        update_test_case_status(test_id, "in-progress")
+        try:
+            process.wait(timeout=config.test_timeout)
+        except subprocess.TimeoutExpired:
+            logger.error(f"Test timed out after {config.test_timeout} seconds")
+            _kill_process_tree(process)
+            process.wait()
+        for reader in readers:
+            reader.join()
+        return process.returncode
+    finally:
+        if process.poll() is None:
+            _kill_process_tree(process)
 
-        process = subprocess.Popen(
-            pytest_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
 
-        for line in process.stdout:
-            logger.info(line.strip())
-        for line in process.stderr:
-            logger.error(line.strip())
+def test_process(queue, test_id, run_id):
+    queue_handler = QueueHandler(queue)
+    sqlite_handler = SQLiteHandler(test_id, run_id)
+    listener = QueueListener(queue, sqlite_handler)
 
-        process.wait()
+    # Cancelled jobs terminate this process; exit through the finally block so the
+    # pytest subprocess is not left running.
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+
+    try:
+        logger = logging.getLogger()
+        logger.setLevel(logging.NOTSET)
+        logger.addHandler(queue_handler)
+        listener.start()
 
-        import xml.etree.ElementTree as ET
+        # Every run keeps its own report, until the run is compacted.
+        xml_path = f"tmp/{tests[str(test_id)]}.{run_id}.xml"
 
-        tree = ET.parse(f"tmp/{tests[str(test_id)]}.xml")
-        root = tree.getroot()
+        update_test_case_status(test_id, "in-progress")
 
-        for testcase in root.iter("testcase"):
-            status = "success"
-            for _ in testcase.iter("failure"):
-                status = "failed"
-                break
-            update_test_case_status(test_id, status)
+        if config.recorded_tests:
+            returncode = run_recorded_test(
+                fetch_test_case(test_id),
+                lambda test_path: _run_pytest(logger, test_path, xml_path),
+            )
+        else:
+            returncode = _run_pytest(
+                logger, f"tests/{tests[str(test_id)]}.py", xml_path
+            )
+
+        if returncode < 0 or not os.path.exists(xml_path):
+            update_test_case_status(test_id, "failed")
+            return
+
+        ingest_junit_xml(test_id, xml_path, run_id)
     except Exception as e:
         logger.error(f"An error occurred: {e}")
     finally:
+        # Runs which ended without results, e.g. on an error or when terminated.
+        finish_test_run(run_id, "failed")
         try:
             listener.stop()
+            sqlite_handler.close()
             logger.removeHandler(queue_handler)
         except Exception as e:
             print(f"Failed to remove handler: {e}")
 
 
-def run_test(test_id):
-    delete_test_logs(test_id)
+def start_test(test_id, job_id=None) -> multiprocessing.Process:
+    run_id = create_test_run(test_id, job_id)
 
     queue = multiprocessing.Queue(-1)
-    process = multiprocessing.Process(target=test_process, args=(queue, test_id))
+    process = multiprocessing.Process(
+        target=test_process, args=(queue, test_id, run_id)
+    )
     process.start()
-    process.join()
+    return process
+
+
+def recorded_test_path(test_case):
+    return f"tests/recorded/test_recorded_{test_case['id']}.py"
 
 
-async def run_test_with_agent(test_case):
+async def run_test_with_agent(test_case, record_to=None):
+    # The agent is heavy to import; test worker processes only need pytest.
+    from e2e_test_agent.e2e_test_agent import E2eTestingAgent
+    from utils.browser_pool import browser_pool
+
     topic = test_case["description"]
 
-    e2e_test_agent = E2eTestingAgent()
-    await e2e_test_agent.ainvoke(topic)
+    try:
+        e2e_test_agent = E2eTestingAgent()
+        return await e2e_test_agent.ainvoke(topic, record_to=record_to)
+    finally:
+        # The run owns the event loop the pool was started on, which ends with it.
+        await browser_pool.close()
+
+
+def run_recorded_test(test_case, run_pytest) -> int:
+    """
+    Replay the compiled recording of the test case without the agent. The agent is
+    only run when there is no recording yet or the recording fails, and its run is
+    recorded again to heal the compiled test, which is then replayed.
+
+    :param test_case: The test case, whose description is the agent's requirement.
+    :param run_pytest: Runs pytest on a module path and returns its exit code.
+    """
+    from e2e_test_agent.recorder import has_verified_outcome, is_successful_run
+
+    test_path = recorded_test_path(test_case)
+    if os.path.exists(test_path):
+        returncode = run_pytest(test_path)
+        if returncode == 0:
+            return returncode
+        logging.info(f"Recorded test {test_path} failed, healing it with the agent")
+
+    steps = asyncio.run(run_test_with_agent(test_case, record_to=test_path))
+    if not (is_successful_run(steps) and has_verified_outcome(steps)):
+        logging.error(f"The agent could not record a passing run of {test_path}")
+        return 1
+    return run_pytest(test_path)
@@ -0,0 +1,44 @@
+import pytest
+import pytest_asyncio
+from pytest_asyncio import is_async_test
+
+from tests.stub_server import start_stub_server
+from utils.browser_pool import browser_pool
+from utils.config import config
+from utils.video_fixtures import synthetic_video
+
+# Just over the 4GB upload limit of the converter.
+LARGE_VIDEO_SIZE = 4 * 1024 * 1024 * 1024 + 1024 * 1024
+
+
+@pytest.fixture(scope="session", autouse=True)
+def stub_converter():
+    """Serve the stub converter for the session when the tests target it."""
+    if config.target != "local":
+        yield None
+        return
+    server = start_stub_server(config.local_target_port)
+    yield server
+    server.shutdown()
+
+
+def pytest_collection_modifyitems(items):
+    """Run every async test on the session event loop, so they share the pool."""
+    session_loop = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if is_async_test(item):
+            item.add_marker(session_loop, append=False)
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session", autouse=True)
+async def close_browser_pool():
+    """Close the pooled browsers once the session, which reuses them, is over."""
+    yield
+    await browser_pool.close()
+
+
+@pytest.fixture
+def large_video():
+    """A sparse MP4 over the upload limit, generated for the test and removed after."""
+    with synthetic_video(LARGE_VIDEO_SIZE) as path:
+        yield path
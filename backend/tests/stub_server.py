@@ -0,0 +1,65 @@
+"""
+Local stand-in for the video converter, used when TARGET=local. It serves a replica
+of the upload form and accepts conversions up to the same 4GB limit, without storing
+or converting anything.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+SIZE_LIMIT = 4 * 1024 * 1024 * 1024
+
+
+class StubConverterHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body: bytes, close=False):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if close:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload, close=False):
+        self._send(status, "application/json", json.dumps(payload).encode(), close)
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/converter.html"):
+            self._send_json(404, {"error": "Not found"})
+            return
+        with open(os.path.join(FIXTURES_DIR, "converter.html"), "rb") as file:
+            self._send(200, "text/html; charset=utf-8", file.read())
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/convert":
+            self._send_json(404, {"error": "Not found"}, close=True)
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > SIZE_LIMIT:
+            # Refuse before reading the body, like the real converter.
+            self._send_json(
+                413, {"error": "File size exceeds the 4GB limit."}, close=True
+            )
+            return
+        remaining = length
+        while remaining > 0:
+            chunk = self.rfile.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        self._send_json(200, {"message": "Your video was converted successfully."})
+
+
+def start_stub_server(port: int = 0, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve the stub converter from a background thread; call shutdown() to stop it."""
+    server = ThreadingHTTPServer((host, port), StubConverterHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
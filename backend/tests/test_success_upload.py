@@ -1,17 +1,17 @@
-from playwright.async_api import async_playwright
 import pytest
 
-CONVERTER_URL = "https://video-converter.com/"
+from utils.browser_pool import browser_pool
+from utils.config import config
+
+CONVERTER_URL = config.converter_url
 VIDEO_PATH = "videos/test_video_1.mp4"
 
 
 @pytest.mark.asyncio
 async def test_success_upload():
-    async with async_playwright() as p:
+    async with browser_pool.page() as page:
         try:
             print("Navigating to the converter URL.")
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
             await page.goto(CONVERTER_URL)
 
             print("Setting input file.")
@@ -24,7 +24,6 @@ async def test_success_upload():
             await page.wait_for_selector("#success-message")
 
             print("Success upload (mp4 < 4GB).")
-            await browser.close()
         except Exception as e:
             print("Failed upload (mp4 < 4GB).")
             raise e
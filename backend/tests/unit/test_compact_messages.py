@@ -0,0 +1,70 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+from e2e_test_agent.states import (
+    SUMMARY_HEADER,
+    SUMMARY_NAME,
+    SUMMARY_OMITTED,
+    compact_messages,
+)
+
+
+def messages(count, start=0):
+    return [HumanMessage(content=f"message {index}") for index in range(start, count)]
+
+
+def test_keeps_short_history():
+    history = messages(3)
+    assert compact_messages(history, keep=3, token_budget=100) == history
+
+
+def test_folds_older_messages_into_summary():
+    compacted = compact_messages(messages(5), keep=2, token_budget=100)
+
+    summary, *rest = compacted
+    assert summary.name == SUMMARY_NAME
+    assert summary.content.splitlines() == [
+        SUMMARY_HEADER,
+        "- human: message 0",
+        "- human: message 1",
+        "- human: message 2",
+    ]
+    assert [message.content for message in rest] == ["message 3", "message 4"]
+
+
+def test_extends_previous_summary():
+    compacted = compact_messages(messages(5), keep=2, token_budget=100)
+    compacted = compact_messages(
+        compacted + messages(7, start=5), keep=2, token_budget=100
+    )
+
+    summary, *rest = compacted
+    assert summary.content.splitlines()[1:] == [
+        f"- human: message {index}" for index in range(5)
+    ]
+    assert [message.content for message in rest] == ["message 5", "message 6"]
+
+
+def test_drops_oldest_lines_over_budget():
+    # Each line is about 5 tokens, so only the last two fit in the budget.
+    compacted = compact_messages(messages(6), keep=1, token_budget=10)
+
+    lines = compacted[0].content.splitlines()
+    assert lines == [
+        SUMMARY_HEADER,
+        SUMMARY_OMITTED,
+        "- human: message 3",
+        "- human: message 4",
+    ]
+
+    # The omission marker is kept, once, when the summary is compacted again.
+    compacted = compact_messages(compacted + messages(7, start=6), 1, 10)
+    lines = compacted[0].content.splitlines()
+    assert lines.count(SUMMARY_OMITTED) == 1
+    assert lines[-1] == "- human: message 5"
+
+
+def test_truncates_long_messages():
+    history = [AIMessage(content="x" * 300), HumanMessage(content="last")]
+    summary = compact_messages(history, keep=1, token_budget=1000)[0]
+    line = summary.content.splitlines()[1]
+    assert line == "- ai: " + "x" * 197 + "..."
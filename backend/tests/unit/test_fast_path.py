@@ -0,0 +1,87 @@
+import pytest
+
+from e2e_test_agent import fast_path as fast_path_module
+from e2e_test_agent.fast_path import fast_path, split_clauses
+from e2e_test_agent.states import ActionStep
+
+REQUIREMENT = (
+    "Navigate to http://127.0.0.1:8765/converter.html then upload the video "
+    "videos/a.mp4 and type 'Bob' into the Name field then click the Convert button"
+)
+ELEMENTS = [
+    {"role": "textbox", "label": "Name", "text": "", "selector": "#name"},
+    {"role": "button", "label": "", "text": "Convert", "selector": "#convert-button"},
+]
+
+
+@pytest.fixture(autouse=True)
+def distilled_page(monkeypatch):
+    async def distill_page(page):
+        return ELEMENTS
+
+    monkeypatch.setattr(fast_path_module, "distill_page", distill_page)
+
+
+def navigate_step():
+    return ActionStep("navigate_page", {"url": "http://127.0.0.1:8765/converter.html"})
+
+
+def test_split_clauses():
+    assert split_clauses(REQUIREMENT) == [
+        "Navigate to http://127.0.0.1:8765/converter.html",
+        "upload the video videos/a.mp4 and type 'Bob' into the Name field",
+        "click the Convert button",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_navigates_first():
+    command = await fast_path(
+        {"requirement": REQUIREMENT, "page": None, "steps": [], "fast_path_steps": 0}
+    )
+    assert command.action == "navigate_page"
+    assert command.data == {"url": "http://127.0.0.1:8765/converter.html"}
+
+
+@pytest.mark.asyncio
+async def test_handles_the_next_clause_after_its_own_steps():
+    command = await fast_path(
+        {
+            "requirement": "Navigate to http://127.0.0.1:8765/ then click Convert",
+            "page": None,
+            "steps": [navigate_step()],
+            "fast_path_steps": 1,
+        }
+    )
+    assert command.action == "click_element"
+    assert command.data == {"selector": "#convert-button"}
+
+
+@pytest.mark.asyncio
+async def test_does_not_skip_a_clause_which_takes_several_actions():
+    # The model uploaded the video but did not type the name yet, so the steps no
+    # longer line up with the clauses and clicking Convert would skip the typing.
+    state = {
+        "requirement": REQUIREMENT,
+        "page": None,
+        "steps": [
+            navigate_step(),
+            ActionStep("input_file", {"selector": "#file", "file_path": "a.mp4"}),
+        ],
+        "fast_path_steps": 1,
+    }
+    assert await fast_path(state) is None
+
+    state["steps"].append(ActionStep("type_text", {"selector": "#name", "text": "Bob"}))
+    assert await fast_path(state) is None
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_a_failed_step():
+    state = {
+        "requirement": "Navigate to http://127.0.0.1:8765/ then click Convert",
+        "page": None,
+        "steps": [ActionStep("navigate_page", {"url": "x"}, error="Timeout")],
+        "fast_path_steps": 1,
+    }
+    assert await fast_path(state) is None
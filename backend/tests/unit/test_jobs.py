@@ -0,0 +1,73 @@
+import pytest
+
+from utils.db import (
+    claim_next_job,
+    create_suite_run,
+    enqueue_job,
+    fetch_job,
+    finish_job,
+    init_db,
+)
+from utils.scheduler import longest_first
+
+
+@pytest.fixture
+def db_name(tmp_path):
+    db_name = str(tmp_path / "test_results.db")
+    init_db(db_name)
+    return db_name
+
+
+def test_enqueue_returns_pending_job(db_name):
+    job = enqueue_job(0, db_name=db_name)
+    again = enqueue_job(0, priority=5, db_name=db_name)
+
+    assert again["id"] == job["id"]
+    # A queued job inherits the higher priority of the trigger it absorbed.
+    assert again["priority"] == 5
+    assert enqueue_job(1, db_name=db_name)["id"] != job["id"]
+
+
+def test_enqueue_joins_every_suite_run(db_name):
+    first = create_suite_run(db_name)
+    second = create_suite_run(db_name)
+    enqueue_job(0, suite_run_id=first, db_name=db_name)
+    job = enqueue_job(0, suite_run_id=second, db_name=db_name)
+
+    assert sorted(job["suite_run_ids"]) == [first, second]
+
+
+def test_enqueue_after_job_finished(db_name):
+    job = enqueue_job(0, db_name=db_name)
+    claim_next_job(db_name)
+    finish_job(job["id"], "done", db_name=db_name)
+
+    assert enqueue_job(0, db_name=db_name)["id"] != job["id"]
+
+
+def test_claims_by_priority(db_name):
+    low = enqueue_job(0, priority=0, db_name=db_name)
+    high = enqueue_job(1, priority=10, db_name=db_name)
+
+    assert claim_next_job(db_name)["id"] == high["id"]
+    assert claim_next_job(db_name)["id"] == low["id"]
+    assert claim_next_job(db_name) is None
+    assert fetch_job(low["id"], db_name)["status"] == "running"
+
+
+def test_running_job_is_not_claimed_twice(db_name):
+    job = enqueue_job(0, db_name=db_name)
+    claim_next_job(db_name)
+
+    # Triggering a running test case returns the running job.
+    assert enqueue_job(0, priority=10, db_name=db_name)["id"] == job["id"]
+    assert fetch_job(job["id"], db_name)["priority"] == 0
+    assert claim_next_job(db_name) is None
+
+
+def test_longest_first():
+    durations = {0: 5.0, 1: 30.0, 2: 12.0}
+    assert longest_first([0, 1, 2], durations) == [1, 2, 0]
+    # Test cases which never ran are assumed to be as long as the longest.
+    assert longest_first([0, 3, 2], durations) == [3, 2, 0]
+    assert longest_first([0, 1], {}) == [0, 1]
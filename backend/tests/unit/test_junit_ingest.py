@@ -0,0 +1,60 @@
+import pytest
+
+from utils.db import init_db, iter_test_results
+from utils.junit_ingest import ingest_junit_xml, iter_junit_results
+
+REPORT = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites>
+  <testsuite name="pytest" tests="4">
+    <testcase classname="tests.test_upload" name="test_passes" time="1.5" />
+    <testcase classname="tests.test_upload" name="test_fails" time="2">
+      <failure message="assert False">Traceback: assert False</failure>
+    </testcase>
+    <testcase classname="tests.test_upload" name="test_errors">
+      <error message="fixture failed" />
+    </testcase>
+    <testcase classname="tests.test_upload" name="test_skipped" time="0">
+      <skipped message="not today" />
+    </testcase>
+  </testsuite>
+</testsuites>
+"""
+
+
+@pytest.fixture
+def report(tmp_path):
+    path = tmp_path / "report.xml"
+    path.write_text(REPORT)
+    return str(path)
+
+
+def test_iter_junit_results(report):
+    assert list(iter_junit_results(report)) == [
+        ("test_passes", "tests.test_upload", "success", 1.5, None),
+        ("test_fails", "tests.test_upload", "failed", 2.0, "Traceback: assert False"),
+        ("test_errors", "tests.test_upload", "failed", 0.0, "fixture failed"),
+        ("test_skipped", "tests.test_upload", "skipped", 0.0, None),
+    ]
+
+
+def test_ingest_junit_xml(report, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    init_db()
+
+    assert ingest_junit_xml(0, report) == "failed"
+    results = list(iter_test_results(0))
+    assert [result["status"] for result in results] == [
+        "success",
+        "failed",
+        "failed",
+        "skipped",
+    ]
+    assert results[1]["error"] == "Traceback: assert False"
+
+    # Results of a later run replace those of the earlier one in the report.
+    passing = tmp_path / "passing.xml"
+    passing.write_text(
+        '<testsuite><testcase classname="c" name="test_passes" time="1" /></testsuite>'
+    )
+    assert ingest_junit_xml(0, str(passing)) == "success"
+    assert [result["name"] for result in iter_test_results(0)] == ["test_passes"]
@@ -0,0 +1,72 @@
+from e2e_test_agent.recorder import (
+    compile_test,
+    has_verified_outcome,
+    is_successful_run,
+    save_compiled_test,
+)
+from e2e_test_agent.states import VERIFY, ActionStep
+from utils.video_fixtures import SYNTHETIC_PREFIX
+
+REQUIREMENT = "Navigate to http://127.0.0.1:8765/converter.html then click Convert"
+
+
+def steps():
+    return [
+        ActionStep("navigate_page", {"url": "http://127.0.0.1:8765/converter.html"}),
+        ActionStep("click_element", {"selector": "#missing"}, "Element not found"),
+        ActionStep("type_text", {"selector": "#name", "text": "Bob's"}),
+        ActionStep(
+            "input_file", {"selector": "#file", "file_path": "videos/sample.mp4"}
+        ),
+        ActionStep("click_element", {"selector": "#convert-button"}),
+        ActionStep(VERIFY, {"kind": "text_visible", "value": "Done"}),
+        ActionStep("END", {}),
+    ]
+
+
+def test_compile_test_replays_successful_steps():
+    source = compile_test(steps(), "test_converter", REQUIREMENT)
+
+    compile(source, "test_converter.py", "exec")
+    assert "async def test_converter():" in source
+    assert f"REQUIREMENT = {REQUIREMENT!r}" in source
+    assert "await page.goto('http://127.0.0.1:8765/converter.html')" in source
+    assert "#missing" not in source
+    assert """await page.fill('#name', "Bob's")""" in source
+    assert "await page.set_input_files('#file', 'videos/sample.mp4')" in source
+    assert "await page.get_by_text('Done').first.wait_for(state=\"visible\")" in source
+    assert source.index("#convert-button") < source.index("'Done'")
+    assert "resolve_file_path" not in source
+
+
+def test_compile_test_resolves_synthetic_files():
+    step = ActionStep(
+        "input_file", {"selector": "#file", "file_path": f"{SYNTHETIC_PREFIX}small"}
+    )
+    source = compile_test([step], "test_upload", REQUIREMENT)
+
+    compile(source, "test_upload.py", "exec")
+    assert "from utils.video_fixtures import resolve_file_path" in source
+    assert f"resolve_file_path('{SYNTHETIC_PREFIX}small')" in source
+
+
+def test_save_compiled_test_names_test_after_file(tmp_path):
+    path = save_compiled_test(
+        steps(), str(tmp_path / "recorded" / "recorded-1.py"), REQUIREMENT
+    )
+    with open(path) as file:
+        assert "async def test_recorded_1():" in file.read()
+
+
+def test_successful_run():
+    assert is_successful_run(steps())
+    assert has_verified_outcome(steps())
+
+    assert not is_successful_run(steps()[:-1])
+    assert not is_successful_run([ActionStep("END", {})])
+    failed_verify = steps()
+    failed_verify[-2] = ActionStep(
+        VERIFY, {"kind": "text_visible", "value": "Done"}, "Text was not shown"
+    )
+    assert not is_successful_run(failed_verify)
+    assert not has_verified_outcome(failed_verify)
@@ -0,0 +1,69 @@
+from e2e_test_agent.run_budget import RunBudget
+from e2e_test_agent.states import VERIFY, ActionStep
+
+
+def budget(max_repeats=3):
+    return RunBudget(
+        max_steps=100, max_seconds=60, max_tokens=10000, max_repeats=max_repeats
+    )
+
+
+def click(selector, error=None):
+    return ActionStep("click_element", {"selector": selector}, error)
+
+
+def test_within_budget():
+    run_budget = budget()
+    run_budget.record(click("#a"))
+    run_budget.record(click("#b"))
+    assert run_budget.exceeded() is None
+
+
+def test_stops_on_repeated_action():
+    run_budget = budget()
+    for _ in range(3):
+        run_budget.record(click("#a"))
+    assert run_budget.exceeded() == "Repeated click_element on #a 3 times in a row"
+
+
+def test_other_action_ends_repeats():
+    run_budget = budget()
+    for selector in ("#a", "#a", "#b", "#a", "#a"):
+        run_budget.record(click(selector))
+    assert run_budget.exceeded() is None
+
+
+def test_postcondition_which_held_ends_repeats():
+    run_budget = budget()
+    run_budget.record(click("#next"))
+    run_budget.record(click("#next"))
+    run_budget.record(ActionStep(VERIFY, {}))
+    run_budget.record(click("#next"))
+    assert run_budget.exceeded() is None
+
+
+def test_failed_postcondition_does_not_end_repeats():
+    run_budget = budget()
+    run_budget.record(click("#next"))
+    run_budget.record(click("#next"))
+    run_budget.record(ActionStep(VERIFY, {}, "Text was not shown"))
+    run_budget.record(click("#next"))
+    assert run_budget.exceeded().startswith("Repeated click_element")
+
+
+def test_stops_on_repeated_failure():
+    run_budget = budget()
+    for selector in ("#a", "#b", "#c"):
+        run_budget.record(click(selector, "Element not found"))
+    assert run_budget.exceeded() == (
+        "Failed 3 times with the same error: Element not found"
+    )
+
+
+def test_stops_at_step_limit():
+    run_budget = RunBudget(max_steps=2, max_seconds=60, max_tokens=10, max_repeats=3)
+    run_budget.record(click("#a"))
+    run_budget.record(ActionStep("END", {}))
+    assert run_budget.exceeded() is None
+    run_budget.record(click("#b"))
+    assert run_budget.exceeded() == "Reached the limit of 2 actions"
@@ -0,0 +1,68 @@
+import pytest
+
+from utils.sqlite_cache import SQLiteCache
+
+
+@pytest.fixture
+def cache_db(tmp_path):
+    return str(tmp_path / "cache.db")
+
+
+def test_get_many_counts_hits_and_misses(cache_db):
+    cache = SQLiteCache(cache_db, "test")
+    cache.set_many({"a": b"1", "b": b"2"})
+
+    assert cache.get_many(["a", "b", "c"]) == {"a": b"1", "b": b"2"}
+    assert cache.get("c") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert (stats["entries"], stats["size_bytes"]) == (2, 2)
+
+
+def test_evicts_within_a_batch_down_to_the_limit(cache_db):
+    # Entries written in one batch share their timestamps, so only part of the
+    # batch may be evicted to fit the limit.
+    cache = SQLiteCache(cache_db, "test", max_bytes=100)
+    cache.set_many({f"key{i}": b"x" * 30 for i in range(5)})
+
+    stats = cache.stats()
+    assert stats["entries"] == 3
+    assert stats["size_bytes"] == 90
+    assert stats["evictions"] == 2
+    assert set(cache.get_many([f"key{i}" for i in range(5)])) == {
+        "key2",
+        "key3",
+        "key4",
+    }
+
+
+def test_evicts_the_least_recently_used_first(cache_db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("utils.sqlite_cache.time.time", lambda: now[0])
+    cache = SQLiteCache(cache_db, "test", max_bytes=60)
+    cache.set("old", b"x" * 30)
+    now[0] += 1
+    cache.set("new", b"x" * 30)
+    now[0] += 1
+    cache.get("old")
+    now[0] += 1
+    cache.set("newest", b"x" * 30)
+
+    assert set(cache.get_many(["old", "new", "newest"])) == {"old", "newest"}
+
+
+def test_drops_entries_past_max_age(cache_db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("utils.sqlite_cache.time.time", lambda: now[0])
+    cache = SQLiteCache(cache_db, "test", max_age=60)
+    cache.set("a", b"1")
+    now[0] += 61
+
+    assert cache.get("a") is None
+    cache.set("b", b"2")
+    assert cache.stats()["entries"] == 1
+
+
+def test_namespaces_are_separate(cache_db):
+    SQLiteCache(cache_db, "one").set("a", b"1")
+    assert SQLiteCache(cache_db, "two").get("a") is None
@@ -0,0 +1,270 @@
+import asyncio
+from contextlib import asynccontextmanager
+import logging
+import os
+import re
+from typing import AsyncIterator, Dict, List, Optional
+
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Page,
+    Playwright,
+    async_playwright,
+)
+
+from utils.browser_server import launch_args
+from utils.config import config
+from utils.network_policy import NetworkPolicy, network_policy
+
+
+class BrowserPool:
+    """
+    Long-lived pool of Chromium browsers which hands out isolated BrowserContexts.
+
+    At most `size` browsers are launched, each one is health-checked before it is
+    handed out and recycled after `max_uses` contexts. With `ws_endpoints`, the
+    browsers are connections to the browser servers kept running by the backend
+    (utils/browser_server.py) instead, so a test run does not launch Chromium. The
+    pool is bound to the event loop it was started on and has to be closed on it.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_uses: int,
+        headless: bool = True,
+        har_mode: str = "off",
+        har_dir: Optional[str] = None,
+        network_policy: Optional[NetworkPolicy] = None,
+        renderer_heap_mb: int = 0,
+        ws_endpoints: Optional[List[str]] = None,
+    ):
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self.har_mode = har_mode
+        self.har_dir = har_dir
+        self._har_contexts: Dict[str, int] = {}
+        self.network_policy = network_policy
+        self.launch_args = launch_args(renderer_heap_mb)
+        self.ws_endpoints = ws_endpoints or []
+        self._connections = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._starting: Optional[asyncio.Task] = None
+        self._playwright: Optional[Playwright] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._idle: List[Browser] = []
+        self._uses: Dict[Browser, int] = {}
+
+    async def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is not None:
+                logging.info("Browser pool used from a new event loop, starting over")
+                self._abandon()
+            # Nothing is awaited before the start task is set, so concurrent first
+            # callers share one Playwright and one semaphore.
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.size)
+            self._starting = loop.create_task(async_playwright().start())
+        try:
+            self._playwright = await asyncio.shield(self._starting)
+        except Exception:
+            if self._loop is loop:
+                self._loop = None
+            raise
+
+    def _abandon(self):
+        """
+        Drop what was started on the previous event loop. When that loop still runs
+        in another thread the browsers and Playwright are closed on it; otherwise
+        the pool was not closed on its loop, which is only logged.
+        """
+        loop, playwright, browsers = self._loop, self._playwright, list(self._uses)
+        self._idle.clear()
+        self._uses.clear()
+        self._playwright = None
+        self._starting = None
+        if playwright is None:
+            return
+        if loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(
+                self._stop(playwright, browsers), loop
+            ).add_done_callback(self._log_abandon_error)
+        else:
+            logging.warning("Browser pool was not closed on the event loop it used")
+
+    async def _stop(self, playwright: Playwright, browsers: List[Browser]):
+        for browser in browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                logging.warning(f"Failed to close browser: {e}")
+        await playwright.stop()
+
+    @staticmethod
+    def _log_abandon_error(future):
+        if not future.cancelled() and future.exception() is not None:
+            logging.warning(
+                f"Failed to stop the browsers of an old loop: {future.exception()}"
+            )
+
+    async def _launch(self) -> Browser:
+        browser = None
+        if self.ws_endpoints:
+            endpoint = self.ws_endpoints[self._connections % len(self.ws_endpoints)]
+            self._connections += 1
+            try:
+                browser = await self._playwright.chromium.connect(endpoint)
+            except Exception as e:
+                logging.warning(f"Failed to connect to browser server {endpoint}: {e}")
+        if browser is None:
+            browser = await self._playwright.chromium.launch(
+                headless=self.headless, args=self.launch_args
+            )
+        self._uses[browser] = 0
+        return browser
+
+    async def _retire(self, browser: Browser):
+        self._uses.pop(browser, None)
+        try:
+            await browser.close()
+        except Exception as e:
+            logging.warning(f"Failed to close retired browser: {e}")
+
+    def _is_healthy(self, browser: Browser) -> bool:
+        return browser.is_connected() and self._uses.get(browser, 0) < self.max_uses
+
+    async def _acquire(self) -> Browser:
+        await self._ensure_started()
+        await self._semaphore.acquire()
+        try:
+            while self._idle:
+                browser = self._idle.pop()
+                if self._is_healthy(browser):
+                    return browser
+                await self._retire(browser)
+            return await self._launch()
+        except Exception:
+            self._semaphore.release()
+            raise
+
+    async def _release(self, browser: Browser):
+        self._uses[browser] = self._uses.get(browser, 0) + 1
+        if self._is_healthy(browser):
+            self._idle.append(browser)
+        else:
+            await self._retire(browser)
+        self._semaphore.release()
+
+    def _har_path(self, har_name: Optional[str]) -> Optional[str]:
+        """
+        The HAR of a context: named after `har_name`, or else after the pytest node
+        id of the running test with the number of the context appended from its
+        second one on, so every test records and replays its own traffic.
+        """
+        if har_name is None:
+            current_test = os.environ.get("PYTEST_CURRENT_TEST")
+            if current_test is None:
+                return None
+            node_id = current_test.rsplit(" (", 1)[0]
+            count = self._har_contexts.get(node_id, 0) + 1
+            self._har_contexts[node_id] = count
+            har_name = node_id if count == 1 else f"{node_id}.{count}"
+        file_name = re.sub(r"[^\w.-]+", "_", har_name) + ".har.zip"
+        return os.path.join(self.har_dir, file_name)
+
+    async def _route_from_har(self, context: BrowserContext, har_name: Optional[str]):
+        """
+        Record the responses of the context into its HAR, which is written when the
+        context closes, or serve them from it and abort requests it does not have.
+        Bodies are stored next to the HAR entries by their hash, so identical
+        responses are kept once.
+        """
+        if self.har_mode not in ("record", "replay"):
+            return
+        har_path = self._har_path(har_name)
+        if har_path is None:
+            logging.warning("No HAR for a context outside a test without a HAR name")
+        elif self.har_mode == "record":
+            os.makedirs(self.har_dir, exist_ok=True)
+            await context.route_from_har(har_path, update=True, update_content="attach")
+        else:
+            await context.route_from_har(har_path, not_found="abort")
+
+    @asynccontextmanager
+    async def context(
+        self, har_name: Optional[str] = None, **kwargs
+    ) -> AsyncIterator[BrowserContext]:
+        """
+        Hand out a fresh BrowserContext on a pooled browser and close it afterwards.
+
+        :param har_name: Name of the HAR the context records into or replays from,
+            by default derived from the running test.
+        :param kwargs: Options passed to Browser.new_context.
+        """
+        if self.network_policy is not None and self.network_policy.disable_animations:
+            kwargs.setdefault("reduced_motion", "reduce")
+        browser = await self._acquire()
+        try:
+            context = await browser.new_context(**kwargs)
+            blocked = {}
+            try:
+                await self._route_from_har(context, har_name)
+                # Routes run newest first, so the policy sees requests before the HAR.
+                if self.network_policy is not None:
+                    blocked = await self.network_policy.apply(context)
+                yield context
+            finally:
+                await context.close()
+                if blocked:
+                    await self._record_blocked(blocked)
+        finally:
+            await self._release(browser)
+
+    async def _record_blocked(self, blocked):
+        try:
+            await asyncio.to_thread(self.network_policy.record, blocked)
+        except Exception as e:
+            logging.warning(f"Failed to record blocked requests: {e}")
+
+    @asynccontextmanager
+    async def page(
+        self, har_name: Optional[str] = None, **kwargs
+    ) -> AsyncIterator[Page]:
+        """Hand out a new page in a fresh BrowserContext on a pooled browser."""
+        async with self.context(har_name, **kwargs) as context:
+            yield await context.new_page()
+
+    async def close(self):
+        """Close every browser of the pool and stop Playwright."""
+        if self._loop is not None and self._loop is not asyncio.get_running_loop():
+            self._abandon()
+            self._loop = None
+            return
+        if self._playwright is None and self._starting is not None:
+            try:
+                self._playwright = await self._starting
+            except Exception:
+                pass
+        for browser in list(self._uses):
+            await self._retire(browser)
+        self._idle.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._playwright = None
+        self._starting = None
+        self._loop = None
+
+
+browser_pool = BrowserPool(
+    size=config.browser_pool_size,
+    max_uses=config.browser_max_uses,
+    headless=config.browser_headless,
+    har_mode=config.har_mode,
+    har_dir=config.har_dir,
+    network_policy=network_policy,
+    renderer_heap_mb=config.renderer_heap_mb,
+    ws_endpoints=config.browser_ws_endpoints,
+)
@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from typing import List
+
+from utils.config import config
+
+# Published for the test processes and their pytest runs, which inherit it.
+WS_ENDPOINTS_ENV = "BROWSER_WS_ENDPOINTS"
+
+
+def launch_args(renderer_heap_mb: int) -> List[str]:
+    """Chromium arguments of the pooled and served browsers."""
+    if not renderer_heap_mb:
+        return []
+    # Applies to every renderer of the browser, not to a single page.
+    return [f"--js-flags=--max-old-space-size={renderer_heap_mb}"]
+
+
+class BrowserServers:
+    """
+    Chromium browser servers kept running by the backend, so test runs connect to a
+    running browser instead of launching their own. Each server is a Playwright
+    `launch-server` process which prints the websocket endpoint of its browser.
+    """
+
+    def __init__(self, count: int, headless: bool, args: List[str]):
+        self.count = count
+        self.headless = headless
+        self.args = args
+        self._processes: List[subprocess.Popen] = []
+        self.endpoints: List[str] = []
+
+    def _launch(self, config_path: str) -> str:
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "playwright",
+                "launch-server",
+                "--browser",
+                "chromium",
+                "--config",
+                config_path,
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+        )
+        self._processes.append(process)
+        endpoint = process.stdout.readline().strip()
+        if not endpoint.startswith("ws"):
+            raise RuntimeError(
+                f"Browser server exited with {process.wait()} before listening"
+            )
+        return endpoint
+
+    def start(self) -> List[str]:
+        """
+        Launch the servers and publish their endpoints in BROWSER_WS_ENDPOINTS.
+        Blocks until every browser is listening.
+        """
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+            json.dump({"headless": self.headless, "args": self.args}, file)
+        try:
+            self.endpoints = [self._launch(file.name) for _ in range(self.count)]
+        except Exception:
+            self.stop()
+            raise
+        finally:
+            os.remove(file.name)
+        os.environ[WS_ENDPOINTS_ENV] = ",".join(self.endpoints)
+        return self.endpoints
+
+    def stop(self):
+        """Close the browsers of the servers and unpublish their endpoints."""
+        os.environ.pop(WS_ENDPOINTS_ENV, None)
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                logging.warning(f"Browser server {process.pid} did not stop, killing")
+                process.kill()
+                process.wait()
+        self._processes = []
+        self.endpoints = []
+
+
+browser_servers = BrowserServers(
+    count=config.browser_servers,
+    headless=config.browser_headless,
+    args=launch_args(config.renderer_heap_mb),
+)
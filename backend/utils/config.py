@@ -6,6 +6,96 @@ class Config:
     def __init__(self):
         load_dotenv()
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
+        # "openai", or "local" for deterministic offline stand-ins of the models.
+        self.model_backend = os.getenv("MODEL_BACKEND", "openai").lower()
+        self.embedding_cache_db = os.getenv("EMBEDDING_CACHE_DB", "embedding_cache.db")
+        self.embedding_cache_max_mb = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))
+        self.embedding_cache_max_age_days = float(
+            os.getenv("EMBEDDING_CACHE_MAX_AGE_DAYS", "30")
+        )
+        self.description_concurrency = int(os.getenv("DESCRIPTION_CONCURRENCY", "8"))
+        self.description_cache_max_age_days = float(
+            os.getenv("DESCRIPTION_CACHE_MAX_AGE_DAYS", "90")
+        )
+        self.browser_pool_size = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+        self.browser_max_uses = int(os.getenv("BROWSER_MAX_USES", "50"))
+        self.browser_headless = os.getenv("BROWSER_HEADLESS", "true").lower() == "true"
+        # Browser servers the backend keeps running for the test runs, 0 to have
+        # every test run launch its own browsers. Their websocket endpoints are
+        # published to the test runs in BROWSER_WS_ENDPOINTS.
+        self.browser_servers = int(os.getenv("BROWSER_SERVERS", "1"))
+        self.browser_ws_endpoints = [
+            endpoint
+            for endpoint in os.getenv("BROWSER_WS_ENDPOINTS", "").split(",")
+            if endpoint
+        ]
+        # Comma separated Playwright resource types and domains which are not loaded.
+        self.block_resource_types = os.getenv(
+            "BLOCK_RESOURCE_TYPES", "image,media,font"
+        )
+        self.block_domains = os.getenv(
+            "BLOCK_DOMAINS",
+            "google-analytics.com,googletagmanager.com,doubleclick.net,"
+            "googlesyndication.com,facebook.net,hotjar.com",
+        )
+        self.disable_animations = (
+            os.getenv("DISABLE_ANIMATIONS", "true").lower() == "true"
+        )
+        # V8 heap limit in MB of every renderer process of the pooled browsers, 0
+        # for Chromium's default. It is a launch flag, so it applies browser-wide and
+        # not to one page; pages sharing a renderer share the limit.
+        self.renderer_heap_mb = int(os.getenv("RENDERER_HEAP_MB", "0"))
+        # "live" runs the tests against the real converter, "local" against the stub
+        # server of tests/stub_server.py.
+        self.target = os.getenv("TARGET", "live").lower()
+        self.local_target_port = int(os.getenv("LOCAL_TARGET_PORT", "8765"))
+        self.converter_url = os.getenv(
+            "CONVERTER_URL",
+            (
+                f"http://127.0.0.1:{self.local_target_port}/"
+                if self.target == "local"
+                else "https://video-converter.com/"
+            ),
+        )
+        # "off", "record" to capture the responses of every test into its own HAR in
+        # HAR_DIR, or "replay" to serve them from it without touching the network.
+        self.har_mode = os.getenv("HAR_MODE", "off").lower()
+        self.har_dir = os.getenv("HAR_DIR", "tests/har")
+        # Run the recording compiled from the agent's run of the test case instead
+        # of its hand-written module, healing it with the agent when it fails.
+        self.recorded_tests = os.getenv("RECORDED_TESTS", "false").lower() == "true"
+        self.scheduler_workers = int(os.getenv("SCHEDULER_WORKERS", "2"))
+        self.test_timeout = float(os.getenv("TEST_TIMEOUT", "900"))
+        self.log_batch_size = int(os.getenv("LOG_BATCH_SIZE", "200"))
+        self.log_flush_interval = float(os.getenv("LOG_FLUSH_INTERVAL", "0.5"))
+        self.log_page_size = int(os.getenv("LOG_PAGE_SIZE", "1000"))
+        self.log_stream_interval = float(os.getenv("LOG_STREAM_INTERVAL", "0.5"))
+        self.log_retention_days = float(os.getenv("LOG_RETENTION_DAYS", "30"))
+        # Runs of a test case whose logs and results are kept; older runs are
+        # compacted to their outcome and timings. 0 keeps everything.
+        self.run_history_full_runs = int(os.getenv("RUN_HISTORY_FULL_RUNS", "20"))
+        self.agent_plan_mode = os.getenv("AGENT_PLAN_MODE", "true").lower() == "true"
+        self.postcondition_timeout = float(os.getenv("POSTCONDITION_TIMEOUT", "5"))
+        self.speculative_retrieval = (
+            os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+        )
+        self.settle_timeout = float(os.getenv("SETTLE_TIMEOUT", "2"))
+        self.history_compaction = (
+            os.getenv("HISTORY_COMPACTION", "true").lower() == "true"
+        )
+        self.history_keep_messages = int(os.getenv("HISTORY_KEEP_MESSAGES", "8"))
+        self.history_token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "500"))
+        self.fast_path = os.getenv("FAST_PATH", "true").lower() == "true"
+        self.command_cache = os.getenv("COMMAND_CACHE", "true").lower() == "true"
+        self.command_cache_max_mb = int(os.getenv("COMMAND_CACHE_MAX_MB", "32"))
+        self.command_cache_max_age_days = float(
+            os.getenv("COMMAND_CACHE_MAX_AGE_DAYS", "7")
+        )
+        self.command_cache_history = int(os.getenv("COMMAND_CACHE_HISTORY", "5"))
+        self.agent_max_steps = int(os.getenv("AGENT_MAX_STEPS", "30"))
+        self.agent_max_seconds = float(os.getenv("AGENT_MAX_SECONDS", "600"))
+        self.agent_max_tokens = int(os.getenv("AGENT_MAX_TOKENS", "200000"))
+        self.agent_max_repeats = int(os.getenv("AGENT_MAX_REPEATS", "3"))
 
 
 config = Config()
@@ -1,48 +1,62 @@
 import csv
-import xml.etree.ElementTree as ET
-import os
-
-from tests import tests
-from utils.openai_client import generate_description
-
-
-def generate_csv_report(test_id: int):
-    csv_path = f"tmp/{tests[str(test_id)]}.csv"
-    if os.path.exists(csv_path):
-        return csv_path
-
-    tree = ET.parse(f"tmp/{tests[str(test_id)]}.xml")
-    root = tree.getroot()
-
-    results = []
-
-    for testcase in root.iter("testcase"):
-        test_name = testcase.get("name")
-        status = "success"
-        error_message = None
-        for failure in testcase.iter("failure"):
-            status = "failed"
-            error_message = failure.text
-
-            results.append(
-                {
-                    "name": test_name,
-                    "status": status,
-                    "error": error_message,
-                    "description": generate_description(error_message),
-                }
-            )
-
-    with open(csv_path, mode="x", newline="") as file:
-        writer = csv.writer(file)
-        writer.writerow(["Test Case Name", "Status", "Error", "Description"])
-        for result in results:
-            writer.writerow(
-                [
-                    result["name"],
-                    result["status"],
-                    result.get("error", ""),
-                    result["description"],
-                ]
-            )
-    return csv_path
+import io
+import json
+from typing import Iterator
+
+from utils.db import (
+    fetch_undescribed_failures,
+    iter_test_results,
+    update_result_descriptions,
+)
+from utils.openai_client import generate_descriptions
+
+REPORT_FORMATS = {"csv": "text/csv", "json": "application/json"}
+
+
+async def describe_failures(test_id: int):
+    """Generate descriptions for the failed results of the latest run, once."""
+    failures = fetch_undescribed_failures(test_id)
+    if not failures:
+        return
+    descriptions = await generate_descriptions([failure for _, failure in failures])
+    update_result_descriptions(
+        [
+            (description, result_id)
+            for (result_id, _), description in zip(failures, descriptions)
+        ]
+    )
+
+
+def _iter_csv(test_id: int) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["Test Case Name", "Status", "Duration", "Error", "Description"])
+    for result in iter_test_results(test_id):
+        writer.writerow(
+            [
+                result["name"],
+                result["status"],
+                result["duration"],
+                result["error"] or "",
+                result["description"] or "",
+            ]
+        )
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _iter_json(test_id: int) -> Iterator[str]:
+    yield "["
+    for index, result in enumerate(iter_test_results(test_id)):
+        yield ("," if index else "") + json.dumps(result)
+    yield "]"
+
+
+def iter_report(test_id: int, report_format: str = "csv") -> Iterator[str]:
+    """Stream the report of the latest run of a test case in the given format."""
+    if report_format == "json":
+        return _iter_json(test_id)
+    return _iter_csv(test_id)
@@ -22,10 +22,32 @@ def init_db(db_name=DB_NAME):
                     test_id TEXT,
                     message TEXT,
                     type TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    run_id INTEGER,
+                    stream TEXT
                 )
             """
             )
+            _add_column_if_missing(cursor, "test_logs", "run_id", "INTEGER")
+            _add_column_if_missing(cursor, "test_logs", "stream", "TEXT")
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_test_logs_test_id_id
+                ON test_logs (test_id, id)
+            """
+            )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_test_logs_run_id_id
+                ON test_logs (run_id, id)
+            """
+            )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_test_logs_created_at
+                ON test_logs (created_at)
+            """
+            )
             cursor.execute(
                 """
                 CREATE TABLE IF NOT EXISTS test_cases (
@@ -36,6 +58,142 @@ def init_db(db_name=DB_NAME):
                 )
             """
             )
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS test_results (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    test_id INTEGER,
+                    run_key TEXT,
+                    name TEXT,
+                    classname TEXT,
+                    status TEXT,
+                    duration REAL,
+                    failure TEXT,
+                    description TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    run_id INTEGER
+                )
+            """
+            )
+            _add_column_if_missing(cursor, "test_results", "run_id", "INTEGER")
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_test_results_test_id_id
+                ON test_results (test_id, id)
+            """
+            )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_test_results_run_id_id
+                ON test_results (run_id, id)
+            """
+            )
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS test_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    test_id INTEGER,
+                    job_id INTEGER,
+                    status TEXT DEFAULT 'running',
+                    passed INTEGER DEFAULT 0,
+                    failed INTEGER DEFAULT 0,
+                    skipped INTEGER DEFAULT 0,
+                    duration REAL,
+                    junit_path TEXT,
+                    compacted INTEGER DEFAULT 0,
+                    started_at TIMESTAMP DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+                    finished_at TIMESTAMP
+                )
+            """
+            )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_test_runs_test_id_id
+                ON test_runs (test_id, id)
+            """
+            )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_test_runs_test_id_started_at
+                ON test_runs (test_id, started_at)
+            """
+            )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_test_runs_started_at
+                ON test_runs (started_at)
+            """
+            )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_test_runs_job_id
+                ON test_runs (job_id)
+            """
+            )
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    test_id INTEGER,
+                    priority INTEGER DEFAULT 0,
+                    status TEXT DEFAULT 'queued',
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    suite_run_id INTEGER
+                )
+            """
+            )
+            # Only read to migrate to suite_run_jobs, which lets a job belong to
+            # more than one suite run.
+            _add_column_if_missing(cursor, "jobs", "suite_run_id", "INTEGER")
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_jobs_status_priority
+                ON jobs (status, priority DESC, id)
+            """
+            )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_jobs_suite_run_id
+                ON jobs (suite_run_id)
+            """
+            )
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS suite_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    status TEXT DEFAULT 'running',
+                    passed INTEGER DEFAULT 0,
+                    failed INTEGER DEFAULT 0,
+                    duration REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            """
+            )
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS suite_run_jobs (
+                    suite_run_id INTEGER,
+                    job_id INTEGER,
+                    PRIMARY KEY (suite_run_id, job_id)
+                )
+            """
+            )
+            cursor.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_suite_run_jobs_job_id
+                ON suite_run_jobs (job_id)
+            """
+            )
+            cursor.execute(
+                """
+                INSERT OR IGNORE INTO suite_run_jobs (suite_run_id, job_id)
+                SELECT suite_run_id, id FROM jobs WHERE suite_run_id IS NOT NULL
+            """
+            )
             conn.commit()
 
             # Insert initial test cases
@@ -51,42 +209,113 @@ def init_db(db_name=DB_NAME):
             conn.commit()
 
 
-def log_test_message(test_id, log_message, message_type, db_name=DB_NAME):
-    """Log a message for a specific test case."""
+def _add_column_if_missing(cursor, table, column, definition):
+    """Add a column to a table created by an earlier version of the schema."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def connect_wal(db_name=DB_NAME) -> sqlite3.Connection:
+    """
+    Open a long-lived connection in WAL mode, usable from any thread. Writes through
+    it do not block readers and are not fsynced on every commit.
+    """
+    conn = sqlite3.connect(db_name, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def log_test_messages(conn, rows):
+    """
+    Log a batch of messages in a single transaction.
+
+    :param conn: The connection to write with, see connect_wal.
+    :param rows: (test_id, run_id, message, type, stream, created_at) tuples, the
+        stream being 'stdout' or 'stderr' for output of the test process, or None.
+    """
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO test_logs (test_id, run_id, message, type, stream, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """,
+            rows,
+        )
+
+
+def fetch_test_logs(test_id, since_id=None, limit=None, run_id=None, db_name=DB_NAME):
+    """
+    Fetch log messages for a specific test case in the order they were written.
+
+    :param since_id: Only fetch messages written after the message with this id.
+    :param limit: The maximum number of messages to fetch.
+    :param run_id: The run to fetch messages of, the latest run by default.
+    """
     with sqlite3.connect(db_name) as conn:
         with closing(conn.cursor()) as cursor:
             cursor.execute(
                 """
-                INSERT INTO test_logs (test_id, message, type)
-                VALUES (?, ?, ?)
+                SELECT id, message, type, created_at, stream FROM test_logs
+                WHERE run_id IS COALESCE(
+                    ?, (SELECT MAX(id) FROM test_runs WHERE test_id = ?)
+                )
+                AND test_id = ? AND id > ? ORDER BY id LIMIT ?
             """,
-                (test_id, log_message, message_type),
+                (
+                    run_id,
+                    test_id,
+                    str(test_id),
+                    since_id or 0,
+                    -1 if limit is None else limit,
+                ),
             )
-            conn.commit()
+            logs = cursor.fetchall()
+            logs_json = [
+                {
+                    "id": log[0],
+                    "message": log[1],
+                    "type": log[2],
+                    "created_at": log[3],
+                    "stream": log[4],
+                }
+                for log in logs
+            ]
+    return logs_json
 
 
-def fetch_test_logs(test_id, db_name=DB_NAME):
-    """Fetch all log messages for a specific test case, sorted by creation time."""
+def fetch_last_log_id(test_id, db_name=DB_NAME):
+    """Fetch the id of the latest log message of a specific test case."""
     with sqlite3.connect(db_name) as conn:
         with closing(conn.cursor()) as cursor:
             cursor.execute(
-                "SELECT message, type, created_at FROM test_logs WHERE test_id = ? ORDER BY created_at",
-                (test_id,),
+                "SELECT MAX(id) FROM test_logs WHERE test_id = ?", (str(test_id),)
             )
-            logs = cursor.fetchall()
-            logs_json = [
-                {"message": log[0], "type": log[1], "created_at": log[2]}
-                for log in logs
-            ]
-    return logs_json
+            last_id = cursor.fetchone()[0]
+    return last_id or 0
 
 
-def delete_test_logs(test_id, db_name=DB_NAME):
-    """Delete all log messages for a specific test case."""
+def purge_old_logs(retention_days, batch_size=5000, db_name=DB_NAME):
+    """Delete log messages older than the retention period, in small batches."""
+    deleted = 0
     with sqlite3.connect(db_name) as conn:
         with closing(conn.cursor()) as cursor:
-            cursor.execute("DELETE FROM test_logs WHERE test_id = ?", (test_id,))
-            conn.commit()
+            while True:
+                cursor.execute(
+                    """
+                    DELETE FROM test_logs WHERE id IN (
+                        SELECT id FROM test_logs
+                        WHERE created_at < datetime('now', ?) LIMIT ?
+                    )
+                """,
+                    (f"-{retention_days} days", batch_size),
+                )
+                conn.commit()
+                deleted += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+    return deleted
 
 
 def fetch_test_cases(db_name: str = DB_NAME) -> List[Dict[str, str]]:
@@ -114,7 +343,7 @@ def fetch_test_case(test_id: int, db_name: str = DB_NAME) -> List[Dict[str, str]
     with sqlite3.connect(db_name) as conn:
         with closing(conn.cursor()) as cursor:
             cursor.execute(
-                "SELECT id, description, status, no_of_steps FROM test_cases WHERE test_id = ?",
+                "SELECT id, description, status, no_of_steps FROM test_cases WHERE id = ?",
                 (test_id,),
             )
             cases = cursor.fetchall()
@@ -148,13 +377,22 @@ def update_test_case_status(test_id, status, db_name=DB_NAME):
 
 
 def reset_all_test_cases(db_name=DB_NAME):
-    """Reset all test cases and delete all log messages."""
+    """
+    Reset all test cases and delete all log messages and results. The summaries of
+    past runs are kept, compacted, so their trends survive a reset.
+    """
     with sqlite3.connect(db_name) as conn:
         with closing(conn.cursor()) as cursor:
             # Delete all log messages
             cursor.execute("DELETE FROM test_logs")
             conn.commit()
 
+            cursor.execute("DELETE FROM test_results")
+            conn.commit()
+
+            cursor.execute("UPDATE test_runs SET compacted = 1, junit_path = NULL")
+            conn.commit()
+
             # Reset the status of all test cases to 'todo'
             cursor.execute("UPDATE test_cases SET status = 'todo'")
             conn.commit()
@@ -172,3 +410,607 @@ def reset_all_test_cases(db_name=DB_NAME):
                     shutil.rmtree(file_path)
             except Exception as e:
                 print(f"Failed to delete {file_path}. Reason: {e}")
+
+
+RESULT_COLUMNS = "name, classname, status, duration, failure, description"
+
+# Selects the results of the latest run of a test case, the same run whose logs
+# fetch_test_logs returns; takes the test id twice.
+LATEST_RESULTS = """
+    run_id IS (SELECT MAX(id) FROM test_runs WHERE test_id = ?) AND test_id = ?
+"""
+
+# The start and end of test runs are kept to the millisecond.
+FINISH_RUN = """
+    finished_at = strftime('%Y-%m-%d %H:%M:%f', 'now'),
+    duration = (julianday('now') - julianday(started_at)) * 86400
+"""
+
+
+def record_test_results(
+    test_id, run_id, run_key, rows, junit_path=None, db_name=DB_NAME
+):
+    """
+    Store the results of a run, and finish the run and update the status of its
+    test case accordingly, in a single transaction. The results of earlier runs
+    are kept.
+
+    :param rows: Iterable of (name, classname, status, duration, failure) tuples.
+    :param junit_path: The report the results were read from, kept with the run.
+    :return: The new status of the test case, 'failed' if any result failed.
+    """
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.executemany(
+                """
+                INSERT INTO test_results
+                (test_id, run_id, run_key, name, classname, status, duration, failure)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                ((test_id, run_id, run_key, *row) for row in rows),
+            )
+            cursor.execute(
+                """
+                SELECT
+                    SUM(status = 'success'), SUM(status = 'failed'), SUM(status = 'skipped')
+                FROM test_results WHERE run_id = ?
+            """,
+                (run_id,),
+            )
+            passed, failed, skipped = cursor.fetchone()
+            status = "failed" if failed else "success"
+            cursor.execute(
+                f"""
+                UPDATE test_runs SET
+                    status = ?, passed = ?, failed = ?, skipped = ?, junit_path = ?,
+                    {FINISH_RUN}
+                WHERE id = ?
+            """,
+                (status, passed or 0, failed or 0, skipped or 0, junit_path, run_id),
+            )
+            cursor.execute(
+                "UPDATE test_cases SET status = ? WHERE id = ?", (status, test_id)
+            )
+            conn.commit()
+    return status
+
+
+def fetch_test_results_run_key(test_id, db_name=DB_NAME):
+    """
+    Fetch the key of the results of the latest run of a test case and how many of
+    them are described, None while the run has no results.
+    """
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                f"""
+                SELECT run_key, COUNT(description) FROM test_results
+                WHERE {LATEST_RESULTS} GROUP BY run_key LIMIT 1
+            """,
+                (test_id, test_id),
+            )
+            row = cursor.fetchone()
+    return tuple(row) if row else None
+
+
+def fetch_undescribed_failures(test_id, db_name=DB_NAME):
+    """
+    Fetch (id, failure) of the failed results of the latest run which have no
+    description yet.
+    """
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                f"""
+                SELECT id, failure FROM test_results
+                WHERE {LATEST_RESULTS} AND status = 'failed' AND description IS NULL
+            """,
+                (test_id, test_id),
+            )
+            return cursor.fetchall()
+
+
+def update_result_descriptions(descriptions, db_name=DB_NAME):
+    """
+    Store descriptions of failed results, given as (description, id) tuples. A
+    None description is skipped, so the result is described again later.
+    """
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.executemany(
+                "UPDATE test_results SET description = ? WHERE id = ?",
+                [row for row in descriptions if row[0] is not None],
+            )
+            conn.commit()
+
+
+def fetch_test_durations(db_name=DB_NAME) -> Dict[int, float]:
+    """Fetch the total duration of the last run of every test case, in seconds."""
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                """
+                SELECT test_id, SUM(duration) FROM test_results AS results
+                WHERE run_id IS (
+                    SELECT run_id FROM test_results
+                    WHERE test_id = results.test_id ORDER BY id DESC LIMIT 1
+                )
+                GROUP BY test_id
+            """
+            )
+            return {test_id: duration or 0.0 for test_id, duration in cursor}
+
+
+def iter_test_results(test_id, batch_size=500, db_name=DB_NAME):
+    """
+    Yield the results of the latest run of a test case as dictionaries, reading
+    them in batches.
+    """
+    with closing(sqlite3.connect(db_name)) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                f"SELECT {RESULT_COLUMNS} FROM test_results WHERE {LATEST_RESULTS} ORDER BY id",
+                (test_id, test_id),
+            )
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield {
+                        "name": row[0],
+                        "classname": row[1],
+                        "status": row[2],
+                        "duration": row[3],
+                        "error": row[4],
+                        "description": row[5],
+                    }
+
+
+JOB_COLUMNS = (
+    "id, test_id, priority, status, error, created_at, started_at, finished_at, "
+    "(SELECT group_concat(suite_run_id) FROM suite_run_jobs WHERE job_id = jobs.id)"
+)
+
+
+def _job_to_json(job):
+    if job is None:
+        return None
+    return {
+        "id": job[0],
+        "test_id": job[1],
+        "priority": job[2],
+        "status": job[3],
+        "error": job[4],
+        "created_at": job[5],
+        "started_at": job[6],
+        "finished_at": job[7],
+        "suite_run_ids": [int(value) for value in (job[8] or "").split(",") if value],
+    }
+
+
+def enqueue_job(test_id, priority=0, suite_run_id=None, db_name=DB_NAME) -> Dict:
+    """
+    Queue a job for a test case. If the test case already has a queued or running
+    job, that job is returned instead and a queued one inherits the higher priority.
+    The job joins the given suite run, also when it already belongs to another one,
+    so it counts towards both.
+    """
+    with closing(sqlite3.connect(db_name, isolation_level=None)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = conn.execute(
+                f"""
+                SELECT {JOB_COLUMNS} FROM jobs
+                WHERE test_id = ? AND status IN ('queued', 'running')
+                ORDER BY id LIMIT 1
+            """,
+                (test_id,),
+            ).fetchone()
+            if job is None:
+                job_id = conn.execute(
+                    "INSERT INTO jobs (test_id, priority) VALUES (?, ?)",
+                    (test_id, priority),
+                ).lastrowid
+            else:
+                job_id = job[0]
+                conn.execute(
+                    """
+                    UPDATE jobs SET priority = MAX(priority, ?)
+                    WHERE id = ? AND status = 'queued'
+                """,
+                    (priority, job_id),
+                )
+            if suite_run_id is not None:
+                conn.execute(
+                    """
+                    INSERT OR IGNORE INTO suite_run_jobs (suite_run_id, job_id)
+                    VALUES (?, ?)
+                """,
+                    (suite_run_id, job_id),
+                )
+            job = conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return _job_to_json(job)
+
+
+def claim_next_job(db_name=DB_NAME) -> Dict:
+    """Mark the queued job with the highest priority as running and return it."""
+    with closing(sqlite3.connect(db_name, isolation_level=None)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = conn.execute(
+                f"""
+                SELECT {JOB_COLUMNS} FROM jobs
+                WHERE status = 'queued' AND test_id NOT IN (
+                    SELECT test_id FROM jobs WHERE status = 'running'
+                )
+                ORDER BY priority DESC, id LIMIT 1
+            """
+            ).fetchone()
+            if job is not None:
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = 'running', started_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """,
+                    (job[0],),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return _job_to_json(job)
+
+
+def finish_job(job_id, status, error=None, db_name=DB_NAME):
+    """Record the final status of a running job."""
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                """
+                UPDATE jobs SET status = ?, error = ?, finished_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'running'
+            """,
+                (status, error, job_id),
+            )
+            conn.commit()
+
+
+def cancel_job(job_id, db_name=DB_NAME) -> Dict:
+    """Cancel a queued or running job and return it with its previous status."""
+    with closing(sqlite3.connect(db_name, isolation_level=None)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if job is not None and job[3] in ("queued", "running"):
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = 'cancelled', finished_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """,
+                    (job_id,),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return _job_to_json(job)
+
+
+def fetch_job(job_id, db_name=DB_NAME) -> Dict:
+    """Fetch a specific job."""
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+            job = cursor.fetchone()
+    return _job_to_json(job)
+
+
+def requeue_running_jobs(db_name=DB_NAME):
+    """Put jobs left running by a previous server process back in the queue."""
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                "UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            )
+            conn.commit()
+
+
+SUITE_RUN_COLUMNS = "id, status, passed, failed, duration, created_at, finished_at"
+
+
+def _suite_run_to_json(suite_run):
+    if suite_run is None:
+        return None
+    return {
+        "id": suite_run[0],
+        "status": suite_run[1],
+        "passed": suite_run[2],
+        "failed": suite_run[3],
+        "duration": suite_run[4],
+        "created_at": suite_run[5],
+        "finished_at": suite_run[6],
+    }
+
+
+def create_suite_run(db_name=DB_NAME) -> int:
+    """Create the record of a run of the whole suite and return its id."""
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute("INSERT INTO suite_runs DEFAULT VALUES")
+            conn.commit()
+            return cursor.lastrowid
+
+
+def finish_suite_run_if_done(suite_run_id, db_name=DB_NAME) -> bool:
+    """
+    Merge the results of the jobs of a suite run into its record once none of them
+    is queued or running anymore. A job counts as passed when it finished and the
+    test run it started succeeded; the outcome of a job is fixed when its run ends,
+    so later runs or resets of the test case do not change it.
+
+    :return: Whether the suite run is finished.
+    """
+    with closing(sqlite3.connect(db_name, isolation_level=None)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            pending, passed, failed = conn.execute(
+                """
+                WITH outcomes AS (
+                    SELECT
+                        jobs.status IN ('queued', 'running') AS pending,
+                        jobs.status = 'done' AND (
+                            SELECT status FROM test_runs WHERE job_id = jobs.id
+                            ORDER BY id DESC LIMIT 1
+                        ) = 'success' AS passed
+                    FROM suite_run_jobs JOIN jobs ON jobs.id = suite_run_jobs.job_id
+                    WHERE suite_run_jobs.suite_run_id = ?
+                )
+                SELECT SUM(pending), SUM(passed), SUM(NOT pending AND NOT passed)
+                FROM outcomes
+            """,
+                (suite_run_id,),
+            ).fetchone()
+            done = not pending
+            if done:
+                conn.execute(
+                    """
+                    UPDATE suite_runs SET
+                        status = CASE WHEN ? > 0 THEN 'failed' ELSE 'success' END,
+                        passed = ?,
+                        failed = ?,
+                        finished_at = CURRENT_TIMESTAMP,
+                        duration = (julianday('now') - julianday(created_at)) * 86400
+                    WHERE id = ? AND status = 'running'
+                """,
+                    (failed or 0, passed or 0, failed or 0, suite_run_id),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return done
+
+
+def fetch_suite_run(suite_run_id, db_name=DB_NAME) -> Dict:
+    """Fetch a suite run together with its jobs."""
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                f"SELECT {SUITE_RUN_COLUMNS} FROM suite_runs WHERE id = ?",
+                (suite_run_id,),
+            )
+            suite_run = _suite_run_to_json(cursor.fetchone())
+            if suite_run is None:
+                return None
+            cursor.execute(
+                f"""
+                SELECT {JOB_COLUMNS} FROM jobs WHERE id IN (
+                    SELECT job_id FROM suite_run_jobs WHERE suite_run_id = ?
+                )
+                ORDER BY id
+            """,
+                (suite_run_id,),
+            )
+            suite_run["jobs"] = [_job_to_json(job) for job in cursor.fetchall()]
+    return suite_run
+
+
+TEST_RUN_COLUMNS = (
+    "id, test_id, job_id, status, passed, failed, skipped, duration, junit_path, "
+    "compacted, started_at, finished_at"
+)
+
+
+def _test_run_to_json(test_run):
+    return {
+        "id": test_run[0],
+        "test_id": test_run[1],
+        "job_id": test_run[2],
+        "status": test_run[3],
+        "passed": test_run[4],
+        "failed": test_run[5],
+        "skipped": test_run[6],
+        "duration": test_run[7],
+        "junit_path": test_run[8],
+        "compacted": bool(test_run[9]),
+        "started_at": test_run[10],
+        "finished_at": test_run[11],
+    }
+
+
+def create_test_run(test_id, job_id=None, db_name=DB_NAME) -> int:
+    """Create the record of a run of a test case and return its id."""
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                "INSERT INTO test_runs (test_id, job_id) VALUES (?, ?)",
+                (test_id, job_id),
+            )
+            conn.commit()
+            return cursor.lastrowid
+
+
+def finish_test_run(run_id, status, db_name=DB_NAME):
+    """Record the final status of a run which ended without results."""
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                f"""
+                UPDATE test_runs SET
+                    status = ?,
+                    {FINISH_RUN}
+                WHERE id = ? AND status = 'running'
+            """,
+                (status, run_id),
+            )
+            conn.commit()
+
+
+def cancel_job_test_runs(job_id, db_name=DB_NAME):
+    """Mark the running runs of a cancelled job as cancelled."""
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                f"""
+                UPDATE test_runs SET status = 'cancelled', {FINISH_RUN}
+                WHERE job_id = ? AND status = 'running'
+            """,
+                (job_id,),
+            )
+            conn.commit()
+
+
+def interrupt_running_test_runs(db_name=DB_NAME):
+    """Mark runs left running by a previous server process as interrupted."""
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                f"""
+                UPDATE test_runs SET status = 'interrupted', {FINISH_RUN}
+                WHERE status = 'running'
+            """
+            )
+            conn.commit()
+
+
+def fetch_test_runs(test_id, limit=20, before_id=None, db_name=DB_NAME) -> List[Dict]:
+    """
+    Fetch the latest runs of a test case, newest first.
+
+    :param before_id: Only fetch runs older than the run with this id.
+    """
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                f"""
+                SELECT {TEST_RUN_COLUMNS} FROM test_runs
+                WHERE test_id = ? AND id < ? ORDER BY id DESC LIMIT ?
+            """,
+                (test_id, before_id or 2**63 - 1, limit),
+            )
+            return [_test_run_to_json(test_run) for test_run in cursor.fetchall()]
+
+
+def fetch_pass_rate(test_id=None, days=30, db_name=DB_NAME) -> List[Dict]:
+    """
+    Fetch the share of completed runs which passed per day, over the last days, for
+    a test case or for all of them. Cancelled and interrupted runs did not complete,
+    so they are counted separately and do not lower the pass rate.
+    """
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                f"""
+                SELECT
+                    date(started_at),
+                    SUM(status IN ('success', 'failed')),
+                    SUM(status = 'success'),
+                    SUM(status IN ('cancelled', 'interrupted'))
+                FROM test_runs
+                WHERE {"test_id = ? AND" if test_id is not None else ""}
+                    started_at >= datetime('now', ?) AND status != 'running'
+                GROUP BY date(started_at) ORDER BY date(started_at)
+            """,
+                (*([test_id] if test_id is not None else []), f"-{days} days"),
+            )
+            return [
+                {
+                    "date": day,
+                    "runs": runs,
+                    "passed": passed,
+                    "pass_rate": passed / runs if runs else None,
+                    "cancelled": cancelled,
+                }
+                for day, runs, passed, cancelled in cursor.fetchall()
+            ]
+
+
+def compact_test_runs(keep, batch_size=5000, db_name=DB_NAME) -> int:
+    """
+    Delete the logs, results and JUnit reports of all but the latest keep runs of
+    every test case, in small batches. The records of the runs stay, so their
+    outcomes and timings remain available. Logs and results written before runs
+    were recorded count as older than any run.
+
+    :return: The number of runs compacted.
+    """
+
+    def delete_in_batches(table, condition, params):
+        while True:
+            cursor.execute(
+                f"""
+                DELETE FROM {table} WHERE id IN (
+                    SELECT id FROM {table} WHERE {condition} LIMIT ?
+                )
+            """,
+                (*params, batch_size),
+            )
+            conn.commit()
+            if cursor.rowcount < batch_size:
+                break
+
+    with sqlite3.connect(db_name) as conn:
+        with closing(conn.cursor()) as cursor:
+            cursor.execute(
+                """
+                SELECT id, junit_path FROM test_runs AS runs
+                WHERE compacted = 0 AND status != 'running' AND (
+                    SELECT COUNT(*) FROM test_runs
+                    WHERE test_id = runs.test_id AND id > runs.id
+                ) >= ?
+            """,
+                (keep,),
+            )
+            test_runs = cursor.fetchall()
+            for run_id, junit_path in test_runs:
+                delete_in_batches("test_logs", "run_id = ?", (run_id,))
+                delete_in_batches("test_results", "run_id = ?", (run_id,))
+                cursor.execute(
+                    "UPDATE test_runs SET compacted = 1, junit_path = NULL WHERE id = ?",
+                    (run_id,),
+                )
+                conn.commit()
+                if junit_path and os.path.exists(junit_path):
+                    os.remove(junit_path)
+
+            cursor.execute(
+                "SELECT test_id FROM test_runs GROUP BY test_id HAVING COUNT(*) >= ?",
+                (keep,),
+            )
+            for (test_id,) in cursor.fetchall():
+                delete_in_batches(
+                    "test_logs", "run_id IS NULL AND test_id = ?", (str(test_id),)
+                )
+                delete_in_batches(
+                    "test_results", "run_id IS NULL AND test_id = ?", (test_id,)
+                )
+    return len(test_runs)
@@ -0,0 +1,56 @@
+import uuid
+import xml.etree.ElementTree as ET
+
+from utils.db import create_test_run, record_test_results
+
+
+def _testcase_result(testcase):
+    status = "success"
+    failure = None
+    for child in testcase:
+        if child.tag in ("failure", "error"):
+            status = "failed"
+            failure = child.text or child.get("message")
+            break
+        if child.tag == "skipped":
+            status = "skipped"
+    return (
+        testcase.get("name"),
+        testcase.get("classname"),
+        status,
+        float(testcase.get("time") or 0),
+        failure,
+    )
+
+
+def iter_junit_results(xml_path):
+    """
+    Yield (name, classname, status, duration, failure) for every testcase of a
+    JUnit XML report, dropping each testcase from the tree once it is read.
+    """
+    parents = []
+    for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+        if event == "start":
+            parents.append(elem)
+            continue
+        parents.pop()
+        if elem.tag == "testcase":
+            yield _testcase_result(elem)
+            if parents:
+                parents[-1].remove(elem)
+
+
+def ingest_junit_xml(test_id, xml_path, run_id=None):
+    """
+    Stream the testcases of a JUnit XML report into the test_results table as the
+    results of a run, and finish the run and set the status of the test case, in a
+    single transaction.
+
+    :param run_id: The run the report belongs to, a new run if not given.
+    :return: The status of the test case, 'failed' if any testcase failed.
+    """
+    if run_id is None:
+        run_id = create_test_run(test_id)
+    return record_test_results(
+        test_id, run_id, uuid.uuid4().hex, iter_junit_results(xml_path), xml_path
+    )
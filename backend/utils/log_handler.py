@@ -1,13 +1,70 @@
+from datetime import datetime, timezone
 import logging
-from utils.db import log_test_message
+import threading
+
+from utils.config import config
+from utils.db import DB_NAME, connect_wal, log_test_messages
 
 
 class SQLiteHandler(logging.Handler):
-    def __init__(self, test_id):
+    """
+    Buffers the log records of a test run and writes them to SQLite in batches over a
+    single connection, whenever batch_size records are pending or flush_interval
+    seconds have passed. Pending records are written when the handler is closed.
+    """
+
+    def __init__(
+        self,
+        test_id,
+        run_id=None,
+        batch_size=None,
+        flush_interval=None,
+        db_name=DB_NAME,
+    ):
         logging.Handler.__init__(self)
         self.test_id = test_id
+        self.run_id = run_id
+        self.batch_size = batch_size or config.log_batch_size
+        self.flush_interval = flush_interval or config.log_flush_interval
+        self.buffer = []
+        self.conn = connect_wal(db_name)
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
 
     def emit(self, record):
         log_entry = self.format(record)
         message_type = "info" if record.levelno <= logging.INFO else "error"
-        log_test_message(self.test_id, log_entry, message_type)
+        created_at = datetime.fromtimestamp(record.created, timezone.utc).strftime(
+            "%Y-%m-%d %H:%M:%S.%f"
+        )[:-3]
+        # Output of the test process is tagged with the stream it was read from.
+        stream = getattr(record, "stream", None)
+        self.buffer.append(
+            (self.test_id, self.run_id, log_entry, message_type, stream, created_at)
+        )
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.buffer:
+                rows, self.buffer = self.buffer, []
+                log_test_messages(self.conn, rows)
+        except Exception as e:
+            print(f"Failed to write test logs: {e}")
+        finally:
+            self.release()
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        if not self._stopped.is_set():
+            self._stopped.set()
+            self._flusher.join()
+            self.flush()
+            self.conn.close()
+        logging.Handler.close(self)
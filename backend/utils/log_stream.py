@@ -0,0 +1,120 @@
+import asyncio
+from collections import defaultdict
+import json
+import logging
+from typing import AsyncIterator, Dict, Optional, Set
+
+from utils.config import config
+from utils.db import fetch_last_log_id, fetch_test_case, fetch_test_logs
+
+
+def format_event(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}", f"data: {json.dumps(data)}"]
+    if event_id is not None:
+        lines.insert(0, f"id: {event_id}")
+    return "\n".join(lines) + "\n\n"
+
+
+class LogBroadcaster:
+    """
+    Pushes new log rows and status changes of test cases to Server-Sent Events
+    subscribers.
+
+    A single tailer per test case reads new rows with an indexed since_id query,
+    however many clients are subscribed, and fans them out to the subscribers.
+    Each subscriber first catches up from its own cursor, so reconnecting clients
+    resume from their Last-Event-ID.
+    """
+
+    def __init__(self, poll_interval: float, keepalive_interval: float = 15.0):
+        self.poll_interval = poll_interval
+        self.keepalive_interval = keepalive_interval
+        self.queue_size = 1000
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._tailers: Dict[int, asyncio.Task] = {}
+
+    def _publish(self, test_id: int, event):
+        for queue in list(self._subscribers[test_id]):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Drop the slow subscriber; its client reconnects from Last-Event-ID.
+                self._subscribers[test_id].discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def _tail(self, test_id: int, cursor: int):
+        test_case = await asyncio.to_thread(fetch_test_case, test_id)
+        status = test_case["status"] if test_case else None
+        while self._subscribers[test_id]:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                logs = await asyncio.to_thread(
+                    fetch_test_logs, test_id, cursor, config.log_page_size
+                )
+                for log in logs:
+                    self._publish(test_id, ("log", log))
+                    cursor = log["id"]
+
+                test_case = await asyncio.to_thread(fetch_test_case, test_id)
+                if test_case and test_case["status"] != status:
+                    status = test_case["status"]
+                    self._publish(test_id, ("status", {"status": status}))
+            except Exception as e:
+                logging.error(f"Error tailing test logs for test_id {test_id}: {e}")
+        self._tailers.pop(test_id, None)
+
+    async def subscribe(
+        self, test_id: int, since_id: Optional[int]
+    ) -> AsyncIterator[str]:
+        """Stream the logs written after since_id and the status of the test case."""
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._subscribers[test_id].add(queue)
+        try:
+            if test_id not in self._tailers:
+                # The tailer starts from the last row before the catch-up below
+                # reads, so no row falls between the two; rows both see are
+                # deduplicated by id.
+                cursor = await asyncio.to_thread(fetch_last_log_id, test_id)
+                if test_id not in self._tailers:
+                    self._tailers[test_id] = asyncio.create_task(
+                        self._tail(test_id, cursor)
+                    )
+
+            test_case = await asyncio.to_thread(fetch_test_case, test_id)
+            if test_case:
+                yield format_event("status", {"status": test_case["status"]})
+
+            cursor = since_id or 0
+            while True:
+                logs = await asyncio.to_thread(
+                    fetch_test_logs, test_id, cursor, config.log_page_size
+                )
+                for log in logs:
+                    yield format_event("log", log, log["id"])
+                    cursor = log["id"]
+                if len(logs) < config.log_page_size:
+                    break
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), self.keepalive_interval)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                name, data = event
+                if name == "log":
+                    if data["id"] <= cursor:
+                        continue
+                    cursor = data["id"]
+                    yield format_event(name, data, data["id"])
+                else:
+                    yield format_event(name, data)
+        finally:
+            self._subscribers[test_id].discard(queue)
+
+
+log_broadcaster = LogBroadcaster(poll_interval=config.log_stream_interval)
@@ -0,0 +1,152 @@
+from collections import defaultdict
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from playwright.async_api import BrowserContext, Request, Route
+
+from utils.config import config
+from utils.db import DB_NAME
+
+# Typical transfer size of a resource, used to estimate what blocking it saved since
+# the size of a response which was never fetched is unknown.
+ESTIMATED_BYTES = {
+    "image": 40_000,
+    "media": 1_000_000,
+    "font": 30_000,
+    "stylesheet": 20_000,
+    "script": 50_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_ESTIMATED_BYTES = 10_000
+
+DISABLE_ANIMATIONS_SCRIPT = """
+document.addEventListener("DOMContentLoaded", () => {
+  const style = document.createElement("style");
+  style.textContent = `*, *::before, *::after {
+    animation: none !important;
+    transition: none !important;
+    scroll-behavior: auto !important;
+  }`;
+  (document.head || document.documentElement).appendChild(style);
+});
+"""
+
+
+class NetworkPolicy:
+    """
+    Blocks requests by resource type or domain for every page of a context, and
+    optionally disables CSS animations and transitions. The top-level document is
+    never blocked. How many requests every rule blocked, and roughly how many bytes
+    that saved, is added up in the database across processes.
+    """
+
+    def __init__(
+        self,
+        blocked_resource_types: Iterable[str],
+        blocked_domains: Iterable[str],
+        disable_animations: bool = False,
+        db_name: str = DB_NAME,
+    ):
+        self.blocked_resource_types = set(blocked_resource_types)
+        self.blocked_domains = [domain.lower() for domain in blocked_domains]
+        self.disable_animations = disable_animations
+        self.db_name = db_name
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def rule_for(self, request: Request) -> Optional[str]:
+        """Return the rule which blocks the request, or None to let it through."""
+        if request.resource_type == "document" and request.frame.parent_frame is None:
+            return None
+        if request.resource_type in self.blocked_resource_types:
+            return f"type:{request.resource_type}"
+        host = (urlsplit(request.url).hostname or "").lower()
+        for domain in self.blocked_domains:
+            if host == domain or host.endswith(f".{domain}"):
+                return f"domain:{domain}"
+        return None
+
+    async def apply(self, context: BrowserContext) -> Dict[str, List[int]]:
+        """
+        Apply the policy to the context.
+
+        :return: The [requests, estimated bytes] blocked by every rule, which keeps
+            counting until the context is closed; pass it to record afterwards.
+        """
+        blocked: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+
+        async def handle(route: Route):
+            rule = self.rule_for(route.request)
+            if rule is None:
+                await route.fallback()
+                return
+            counts = blocked[rule]
+            counts[0] += 1
+            counts[1] += ESTIMATED_BYTES.get(
+                route.request.resource_type, DEFAULT_ESTIMATED_BYTES
+            )
+            await route.abort("blockedbyclient")
+
+        if self.blocked_resource_types or self.blocked_domains:
+            await context.route("**/*", handle)
+        if self.disable_animations:
+            await context.add_init_script(DISABLE_ANIMATIONS_SCRIPT)
+        return blocked
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        if not self._initialized:
+            with self._lock, conn:
+                conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS network_policy_stats (
+                        rule TEXT PRIMARY KEY,
+                        requests INTEGER DEFAULT 0,
+                        bytes INTEGER DEFAULT 0
+                    )
+                """
+                )
+                self._initialized = True
+        return conn
+
+    def record(self, blocked: Dict[str, List[int]]):
+        """Add the requests and bytes blocked in a context to the totals."""
+        if not blocked:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                """
+                INSERT INTO network_policy_stats (rule, requests, bytes)
+                VALUES (?, ?, ?)
+                ON CONFLICT (rule) DO UPDATE SET
+                    requests = requests + excluded.requests,
+                    bytes = bytes + excluded.bytes
+            """,
+                [(rule, requests, size) for rule, (requests, size) in blocked.items()],
+            )
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Fetch the requests and estimated bytes blocked by every rule so far."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT rule, requests, bytes FROM network_policy_stats ORDER BY rule"
+            ).fetchall()
+        return {
+            rule: {"requests": requests, "estimated_bytes": size}
+            for rule, requests, size in rows
+        }
+
+
+def _split(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+network_policy = NetworkPolicy(
+    blocked_resource_types=_split(config.block_resource_types),
+    blocked_domains=_split(config.block_domains),
+    disable_animations=config.disable_animations,
+)
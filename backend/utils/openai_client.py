@@ -1,22 +1,129 @@
-from openai import OpenAI
+import asyncio
+from functools import lru_cache
+import hashlib
+import re
+from typing import List, Optional
+
 from utils.config import config
+from utils.db import DB_NAME
+from utils.sqlite_cache import SQLiteCache
+
+
+@lru_cache(maxsize=None)
+def get_async_client():
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=config.openai_api_key)
+
+
+description_cache = SQLiteCache(
+    DB_NAME,
+    "error_descriptions",
+    max_age=config.description_cache_max_age_days * 24 * 60 * 60,
+)
+
+# Parts of an error message which change from run to run without changing its meaning.
+VOLATILE_PATTERNS = [
+    (re.compile(r"0x[0-9a-fA-F]+"), "0x?"),
+    (
+        re.compile(
+            r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?"
+        ),
+        "<time>",
+    ),
+    (re.compile(r"\b\d{2}:\d{2}:\d{2}(?:[.,]\d+)?\b"), "<time>"),
+    (
+        re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b"),
+        "<uuid>",
+    ),
+    (re.compile(r"(/tmp|/var/folders)/\S+"), "<tmp>"),
+    (re.compile(r"\b\d+(?:\.\d+)?\s?(ms|s)\b"), r"<n>\1"),
+    (re.compile(r"\b\d{4,}\b"), "<n>"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def normalize_error(error_msg: Optional[str]) -> str:
+    """Strip addresses, timestamps, ids and durations from an error message."""
+    normalized = error_msg or ""
+    for pattern, replacement in VOLATILE_PATTERNS:
+        normalized = pattern.sub(replacement, normalized)
+    return normalized.strip()
+
+
+def _cache_key(error_msg: Optional[str]) -> str:
+    return hashlib.sha256(normalize_error(error_msg).encode("utf-8")).hexdigest()
+
 
-client = OpenAI(api_key=config.openai_api_key)
-
-
-def generate_description(error_msg):
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": "Generate brief description about the test error",
-            },
-            {
-                "role": "user",
-                "content": f"Here is the error message: {error_msg}",
-            },
-        ],
-        model="gpt-3.5-turbo",
+def _messages(error_msg):
+    return [
+        {
+            "role": "system",
+            "content": "Generate brief description about the test error",
+        },
+        {
+            "role": "user",
+            "content": f"Here is the error message: {error_msg}",
+        },
+    ]
+
+
+def local_description(error_msg: Optional[str]) -> str:
+    """Describe an error without a model, for MODEL_BACKEND=local."""
+    lines = normalize_error(error_msg).split(". ")
+    return f"Test failed: {lines[0][:200]}" if lines[0] else "Test failed."
+
+
+async def generate_descriptions(
+    error_msgs: List[Optional[str]],
+) -> List[Optional[str]]:
+    """
+    Generate descriptions for many error messages concurrently. The description
+    of an error which could not be described is None, so it is retried later.
+
+    Errors which only differ in addresses, timestamps, ids or durations share one
+    description, and descriptions are cached across runs by the hash of the
+    normalized error.
+    """
+    if config.model_backend == "local":
+        return [local_description(error_msg) for error_msg in error_msgs]
+
+    keys = [_cache_key(error_msg) for error_msg in error_msgs]
+    cached = await asyncio.to_thread(description_cache.get_many, keys)
+    descriptions = {key: value.decode("utf-8") for key, value in cached.items()}
+
+    pending = {}
+    for key, error_msg in zip(keys, error_msgs):
+        if key not in descriptions:
+            pending.setdefault(key, error_msg)
+
+    semaphore = asyncio.Semaphore(config.description_concurrency)
+
+    async def describe(key, error_msg):
+        async with semaphore:
+            chat_completion = await get_async_client().chat.completions.create(
+                messages=_messages(error_msg),
+                model="gpt-3.5-turbo",
+            )
+        content = chat_completion.choices[0].message.content
+        if content is None:
+            raise ValueError("The model returned no description")
+        descriptions[key] = content
+
+    results = await asyncio.gather(
+        *(describe(key, error_msg) for key, error_msg in pending.items()),
+        return_exceptions=True,
     )
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Failed to generate error description: {result}")
 
-    return chat_completion.choices[0].message.content
+    await asyncio.to_thread(
+        description_cache.set_many,
+        {
+            key: descriptions[key].encode("utf-8")
+            for key in pending
+            if key in descriptions
+        },
+    )
+    return [descriptions.get(key) for key in keys]
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import multiprocessing
+from typing import Dict, Iterable, List, Optional, Set
+
+from tests import start_test
+from utils.config import config
+from utils.db import (
+    cancel_job,
+    cancel_job_test_runs,
+    claim_next_job,
+    create_suite_run,
+    enqueue_job,
+    fetch_job,
+    fetch_test_durations,
+    finish_job,
+    finish_suite_run_if_done,
+    interrupt_running_test_runs,
+    requeue_running_jobs,
+    update_test_case_status,
+)
+
+
+def longest_first(test_ids: Iterable[int], durations: Dict[int, float]) -> List[int]:
+    """
+    Order test cases by the duration of their last run, longest first, which is the
+    order in which workers taking the next job whenever they are idle balance the
+    suite best. Test cases which never ran are assumed to be as long as the longest.
+    """
+    default = max(durations.values(), default=0.0)
+    return sorted(test_ids, key=lambda test_id: -durations.get(test_id, default))
+
+
+def _enqueue_suite(test_ids: Iterable[int], priority: int) -> Dict:
+    suite_run_id = create_suite_run()
+    jobs = [
+        enqueue_job(test_id, priority, suite_run_id)
+        for test_id in longest_first(test_ids, fetch_test_durations())
+    ]
+    return {"suite_run_id": suite_run_id, "jobs": jobs}
+
+
+def _finish_suite_runs(suite_run_ids: Iterable[int]):
+    for suite_run_id in suite_run_ids:
+        finish_suite_run_if_done(suite_run_id)
+
+
+class JobScheduler:
+    """
+    Runs queued test jobs on a fixed number of workers.
+
+    Jobs are persisted in the jobs table, so they survive restarts, and are picked
+    by priority. A test case has at most one queued or running job at a time;
+    triggering it again returns the existing job. Each worker waits for its test
+    process without blocking a thread, so bursts of triggers never queue up in
+    the server's threadpool, and the database writes and the forks of test
+    processes run in threads, off the event loop.
+    """
+
+    def __init__(self, worker_count: int, poll_interval: float = 1.0):
+        self.worker_count = worker_count
+        self.poll_interval = poll_interval
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[int, multiprocessing.Process] = {}
+        # Running jobs cancelled while their test process was being forked.
+        self._cancelled: Set[int] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        requeue_running_jobs()
+        interrupt_running_test_runs()
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"job-worker-{index}")
+            for index in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for process in self._running.values():
+            process.terminate()
+
+    async def submit(self, test_id: int, priority: int = 0) -> Dict:
+        """Queue a job for the test case, or return the one already pending."""
+        job = await asyncio.to_thread(enqueue_job, test_id, priority)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def submit_suite(self, test_ids: Iterable[int], priority: int = 0) -> Dict:
+        """
+        Queue a job for every test case under a new suite run, longest test first, so
+        the whole suite takes about as long as its slowest test when there are
+        enough workers.
+        """
+        suite = await asyncio.to_thread(_enqueue_suite, test_ids, priority)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return suite
+
+    async def cancel(self, job_id: int) -> Optional[Dict]:
+        """Cancel a queued job, or terminate the test process of a running one."""
+        job = await asyncio.to_thread(cancel_job, job_id)
+        if job is not None and job["status"] == "running":
+            process = self._running.get(job_id)
+            await asyncio.to_thread(cancel_job_test_runs, job_id)
+            if process is not None:
+                process.terminate()
+            else:
+                self._cancelled.add(job_id)
+            await asyncio.to_thread(update_test_case_status, job["test_id"], "todo")
+        if job is not None:
+            await asyncio.to_thread(_finish_suite_runs, job["suite_run_ids"])
+        return job
+
+    async def _work(self):
+        while True:
+            job = await asyncio.to_thread(claim_next_job)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(
+                    f"Job {job['id']} for test_id {job['test_id']} failed: {e}"
+                )
+                await asyncio.to_thread(finish_job, job["id"], "failed", str(e))
+            # The job may have joined suite runs while it was running.
+            job = await asyncio.to_thread(fetch_job, job["id"])
+            await asyncio.to_thread(_finish_suite_runs, job["suite_run_ids"])
+
+    async def _run(self, job: Dict):
+        logging.info(f"Starting job {job['id']} for test_id {job['test_id']}")
+        process = await asyncio.to_thread(start_test, job["test_id"], job["id"])
+        self._running[job["id"]] = process
+        if job["id"] in self._cancelled:
+            self._cancelled.discard(job["id"])
+            process.terminate()
+        try:
+            while process.is_alive():
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            self._running.pop(job["id"], None)
+
+        if process.exitcode == 0:
+            await asyncio.to_thread(finish_job, job["id"], "done")
+        else:
+            await asyncio.to_thread(
+                finish_job,
+                job["id"],
+                "failed",
+                f"Test process exited with {process.exitcode}",
+            )
+
+
+scheduler = JobScheduler(worker_count=config.scheduler_workers)
@@ -0,0 +1,208 @@
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, Iterable, Optional
+
+from utils.config import config
+
+
+class SQLiteCache:
+    """
+    Disk-backed key/value cache shared by every process that opens the same file.
+
+    Entries are evicted least-recently-used first, and the earliest written first
+    among entries used at the same time, once the total size of the values exceeds
+    max_bytes. Entries which were not used within max_age seconds are dropped. Hit
+    and miss counters are kept in the database so that they add up across processes.
+    """
+
+    def __init__(
+        self,
+        db_name: str,
+        namespace: str,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+    ):
+        self.db_name = db_name
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        if not self._initialized:
+            with self._lock:
+                self._init_db(conn)
+                self._initialized = True
+        return conn
+
+    def _init_db(self, conn: sqlite3.Connection):
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT,
+                    key TEXT,
+                    value BLOB,
+                    size INTEGER,
+                    created_at REAL,
+                    last_used_at REAL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """
+            )
+            conn.execute(
+                """
+                CREATE INDEX IF NOT EXISTS idx_cache_entries_last_used
+                ON cache_entries (namespace, last_used_at)
+            """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_stats (
+                    namespace TEXT PRIMARY KEY,
+                    hits INTEGER DEFAULT 0,
+                    misses INTEGER DEFAULT 0,
+                    evictions INTEGER DEFAULT 0
+                )
+            """
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO cache_stats (namespace) VALUES (?)",
+                (self.namespace,),
+            )
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Return the cached values for the given keys, skipping missing ones."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        found: Dict[str, bytes] = {}
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                placeholders = ", ".join("?" * len(batch))
+                rows = conn.execute(
+                    f"""
+                    SELECT key, value, last_used_at FROM cache_entries
+                    WHERE namespace = ? AND key IN ({placeholders})
+                """,
+                    (self.namespace, *batch),
+                ).fetchall()
+                for key, value, last_used_at in rows:
+                    if self.max_age is None or now - last_used_at <= self.max_age:
+                        found[key] = value
+
+            if found:
+                conn.executemany(
+                    """
+                    UPDATE cache_entries SET last_used_at = ?
+                    WHERE namespace = ? AND key = ?
+                """,
+                    [(now, self.namespace, key) for key in found],
+                )
+            conn.execute(
+                """
+                UPDATE cache_stats SET hits = hits + ?, misses = misses + ?
+                WHERE namespace = ?
+            """,
+                (len(found), len(keys) - len(found), self.namespace),
+            )
+        return found
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items: Dict[str, bytes]):
+        """Store the given values and evict entries over the size and age limits."""
+        if not items:
+            return
+
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO cache_entries
+                (namespace, key, value, size, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """,
+                [
+                    (self.namespace, key, value, len(value), now, now)
+                    for key, value in items.items()
+                ],
+            )
+            self._evict(conn, now)
+
+    def set(self, key: str, value: bytes):
+        self.set_many({key: value})
+
+    def delete(self, key: str):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            )
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        evicted = 0
+        if self.max_age is not None:
+            evicted += conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND last_used_at < ?",
+                (self.namespace, now - self.max_age),
+            ).rowcount
+        if self.max_bytes is not None:
+            evicted += conn.execute(
+                """
+                DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (
+                            ORDER BY last_used_at DESC, created_at DESC, rowid DESC
+                            ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                        ) AS total_size
+                        FROM cache_entries WHERE namespace = ?
+                    ) WHERE total_size > ?
+                )
+            """,
+                (self.namespace, self.namespace, self.max_bytes),
+            ).rowcount
+        if evicted:
+            conn.execute(
+                "UPDATE cache_stats SET evictions = evictions + ? WHERE namespace = ?",
+                (evicted, self.namespace),
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Fetch the hit/miss counters and the current size of the cache."""
+        with closing(self._connect()) as conn:
+            hits, misses, evictions = conn.execute(
+                "SELECT hits, misses, evictions FROM cache_stats WHERE namespace = ?",
+                (self.namespace,),
+            ).fetchone()
+            entries, size = conn.execute(
+                """
+                SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries
+                WHERE namespace = ?
+            """,
+                (self.namespace,),
+            ).fetchone()
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "entries": entries,
+            "size_bytes": size,
+        }
+
+
+embedding_cache = SQLiteCache(
+    config.embedding_cache_db,
+    "embeddings",
+    max_bytes=config.embedding_cache_max_mb * 1024 * 1024,
+    max_age=config.embedding_cache_max_age_days * 24 * 60 * 60,
+)
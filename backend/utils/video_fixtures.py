@@ -0,0 +1,108 @@
+import atexit
+from contextlib import contextmanager
+import os
+import re
+import shutil
+import struct
+import tempfile
+from typing import Iterator, Optional
+
+# File paths with this prefix are generated on demand, e.g. "synthetic:4GB+1MB.mp4".
+SYNTHETIC_PREFIX = "synthetic:"
+
+SIZE_UNITS = {
+    "": 1,
+    "b": 1,
+    "kb": 1024,
+    "kib": 1024,
+    "mb": 1024**2,
+    "mib": 1024**2,
+    "gb": 1024**3,
+    "gib": 1024**3,
+}
+EXTENSION_PATTERN = re.compile(r"(.+)\.([A-Za-z][A-Za-z0-9]*)")
+SIZE_TERM = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([a-z]*)\s*$", re.IGNORECASE)
+
+# ftyp box: size, type, major brand, minor version and compatible brands.
+FTYP_BOX = struct.pack(">I4s4sI", 28, b"ftyp", b"isom", 0x200) + b"isomiso2mp41"
+MIN_SIZE = len(FTYP_BOX) + 16
+
+_generated_dir: Optional[str] = None
+
+
+def parse_size(text: str) -> int:
+    """
+    Parse a size such as "4GB", "1.5 GiB" or "4GB+1MB" into bytes. Units are
+    binary, so "4GB" is 4 * 1024^3 bytes like the upload limit of the converter.
+    """
+    total = 0
+    for term in text.split("+"):
+        match = SIZE_TERM.match(term)
+        if match is None or match[2].lower() not in SIZE_UNITS:
+            raise ValueError(f"Invalid size: {text}")
+        total += int(float(match[1]) * SIZE_UNITS[match[2].lower()])
+    return total
+
+
+def write_synthetic_mp4(path: str, size: int) -> str:
+    """
+    Create an MP4 file of exactly `size` bytes without writing its content: an ftyp
+    box followed by an mdat box spanning the rest of the file, which is left sparse
+    on file systems which support it.
+    """
+    if size < MIN_SIZE:
+        raise ValueError(f"A synthetic MP4 needs at least {MIN_SIZE} bytes")
+    mdat_size = size - len(FTYP_BOX)
+    if mdat_size > 0xFFFFFFFF:
+        mdat_header = struct.pack(">I4sQ", 1, b"mdat", mdat_size)
+    else:
+        mdat_header = struct.pack(">I4s", mdat_size, b"mdat")
+    with open(path, "wb") as file:
+        file.write(FTYP_BOX)
+        file.write(mdat_header)
+        file.truncate(size)
+    return path
+
+
+@contextmanager
+def synthetic_video(size: int, name: str = "video.mp4") -> Iterator[str]:
+    """Create a synthetic MP4 of the size in a temporary directory, removed afterwards."""
+    directory = tempfile.mkdtemp(prefix="synthetic-video-")
+    try:
+        yield write_synthetic_mp4(os.path.join(directory, name), size)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _cleanup_generated():
+    if _generated_dir is not None:
+        shutil.rmtree(_generated_dir, ignore_errors=True)
+
+
+def resolve_file_path(file_path: str) -> str:
+    """
+    Return the path of the file to upload. A "synthetic:<size>[.ext]" path is
+    generated once per process and removed when the process exits; any other path
+    is returned as it is.
+    """
+    if not file_path.startswith(SYNTHETIC_PREFIX):
+        return file_path
+
+    global _generated_dir
+    spec = file_path[len(SYNTHETIC_PREFIX) :]
+    # Only an alphabetic suffix which is not a size unit is an extension, so the
+    # ".5GB" of "1.5GB" stays part of the size.
+    match = EXTENSION_PATTERN.fullmatch(spec)
+    if match is None or match[2].lower() in SIZE_UNITS:
+        size_text, extension = spec, ".mp4"
+    else:
+        size_text, extension = match[1], f".{match[2]}"
+    size = parse_size(size_text)
+
+    if _generated_dir is None:
+        _generated_dir = tempfile.mkdtemp(prefix="synthetic-videos-")
+        atexit.register(_cleanup_generated)
+    path = os.path.join(_generated_dir, f"{size}{extension}")
+    if not os.path.exists(path) or os.path.getsize(path) != size:
+        write_synthetic_mp4(path, size)
+    return path
@@ -1,5 +1,5 @@
 import { dbTestCaseToDomain, dbTestLogToDomain } from "@/utils/conversion";
-import { TestCase, TestLogItem } from "@/types";
+import { TestCase, TestLogItem, TestStatus } from "@/types";
 
 export const fetchTestCases = async (): Promise<TestCase[]> => {
   try {
@@ -12,17 +12,24 @@ export const fetchTestCases = async (): Promise<TestCase[]> => {
   }
 };
 
-export const fetchTestLogs = async (
-  selectedIndex: number
-): Promise<TestLogItem[]> => {
-  try {
-    const response = await fetch(`/api/test-logs/${selectedIndex}`)
-      .then((res) => res.json())
-      .then((res) => res.data.map(dbTestLogToDomain) as TestLogItem[]);
-    return response;
-  } catch (err) {
-    throw err;
-  }
+export const subscribeTestLogs = (
+  selectedIndex: number,
+  sinceId: number | undefined,
+  onLog: (log: TestLogItem) => void,
+  onStatus: (status: TestStatus) => void
+): EventSource => {
+  const query = sinceId !== undefined ? `?since_id=${sinceId}` : "";
+  const source = new EventSource(
+    `/api/test-logs/${selectedIndex}/stream${query}`
+  );
+
+  source.addEventListener("log", (event) =>
+    onLog(dbTestLogToDomain(JSON.parse((event as MessageEvent).data)))
+  );
+  source.addEventListener("status", (event) =>
+    onStatus(JSON.parse((event as MessageEvent).data).status as TestStatus)
+  );
+  return source;
 };
 
 export const triggerTest = async (selectedIndex: number): Promise<void> => {
@@ -1,4 +1,4 @@
-import { useCallback, useEffect, useMemo, useState } from "react";
+import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import { Button } from "@nextui-org/button";
 import {
   Card,
@@ -14,20 +14,19 @@ import { ThemeSwitch } from "@/components/theme-switch";
 import DefaultLayout from "@/layouts/default";
 import {
   fetchTestCases,
-  fetchTestLogs,
   resetTests,
+  subscribeTestLogs,
   triggerTest,
 } from "@/libs/api";
 import { TestCase, TestLogItem } from "@/types";
 
-let intervalId: NodeJS.Timeout;
-
 export default function IndexPage() {
   const [selectedKeys, setSelectedKeys] = useState<Set<string>>(new Set([]));
   const [cases, setCases] = useState<TestCase[]>([]);
   const [logs, setLogs] = useState<Record<string, TestLogItem[]>>({});
   const [isLoadingLogs, setIsLoadingLogs] = useState<boolean>(false);
   const [isExpanded, setIsExpanded] = useState<boolean>(false);
+  const logCursors = useRef<Record<number, number | undefined>>({});
 
   useEffect(() => {
     const intervalId = setInterval(() => {
@@ -41,30 +40,37 @@ export default function IndexPage() {
     const selectedIndex =
       selectedKeys.size > 0 ? Number(selectedKeys.values().next().value) : null;
 
-    if (intervalId) clearInterval(intervalId);
-
-    const fetchLogs = (selectedIndex: number) => {
-      setIsLoadingLogs(true);
-      fetchTestLogs(selectedIndex)
-        .then((res) =>
-          setLogs((prv) => ({
-            ...prv,
-            [selectedIndex]: res,
-          }))
+    if (selectedIndex === null) return;
+
+    setIsLoadingLogs(true);
+    const source = subscribeTestLogs(
+      selectedIndex,
+      logCursors.current[selectedIndex],
+      (log) => {
+        logCursors.current[selectedIndex] = log.id;
+        setLogs((prv) => ({
+          ...prv,
+          [selectedIndex]: [...(prv[selectedIndex] ?? []), log],
+        }));
+      },
+      (status) =>
+        setCases((prv) =>
+          prv.map((testCase, index) =>
+            index === selectedIndex ? { ...testCase, status } : testCase
+          )
         )
-        .finally(() => setTimeout(() => setIsLoadingLogs(false), 500));
-    };
+    );
 
-    if (selectedIndex !== null)
-      intervalId = setInterval(() => fetchLogs(selectedIndex), 1000);
+    source.onopen = () => setIsLoadingLogs(false);
+    source.onerror = () => setIsLoadingLogs(true);
 
-    return () => {
-      if (intervalId) clearInterval(intervalId);
-    };
+    return () => source.close();
   }, [selectedKeys]);
 
   const handleStart = useCallback(
     (selectedIndex: number) => () => {
+      logCursors.current[selectedIndex] = undefined;
+      setLogs((prv) => ({ ...prv, [selectedIndex]: [] }));
       triggerTest(selectedIndex)
         .then(() => console.log("Triggered"))
         .catch((err) => console.error("Failed to trigger test:", err));
@@ -73,6 +79,8 @@ export default function IndexPage() {
   );
 
   const handleResetAll = useCallback(() => {
+    logCursors.current = {};
+    setLogs({});
     resetTests()
       .then(() => console.log("Success"))
       .catch((err) => console.error("Failed to reset tests:", err));
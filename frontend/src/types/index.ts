@@ -15,8 +15,12 @@ export interface TestCase {
 
 export type TestLogType = "error" | "info";
 
+export type TestLogStream = "stdout" | "stderr";
+
 export interface TestLogItem {
+  id: number;
   message: string;
   createdAt: Date;
   type: TestLogType;
+  stream?: TestLogStream;
 }
@@ -1,4 +1,10 @@
-import { TestCase, TestLogItem, TestLogType, TestStatus } from "@/types";
+import {
+  TestCase,
+  TestLogItem,
+  TestLogStream,
+  TestLogType,
+  TestStatus,
+} from "@/types";
 
 interface DbTestCase {
   id: number;
@@ -8,9 +14,11 @@ interface DbTestCase {
 }
 
 interface DbTestLog {
+  id: number;
   message: string;
   created_at: string;
   type: string;
+  stream: string | null;
 }
 
 export const dbTestCaseToDomain = (dbTestCase: DbTestCase) => {
@@ -25,5 +33,6 @@ export const dbTestLogToDomain = (dbTestLog: DbTestLog) => {
     ...dbTestLog,
     createdAt: new Date(dbTestLog.created_at),
     type: dbTestLog.type as TestLogType,
+    stream: (dbTestLog.stream ?? undefined) as TestLogStream | undefined,
   } as TestLogItem;
 };